@@ -0,0 +1,62 @@
+import math
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import JSONRenderer
+
+
+def has_non_finite_float(data) -> bool:
+    """Return True if `data` contains NaN or an infinity anywhere in its dicts, lists and tuples."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renders the response data to JSON with orjson, byte for byte like DRF's `JSONRenderer` in compact mode.
+
+    Dates and times are passed through to DRF's encoder, as are the types orjson does not serialize natively
+    (lazy strings, Decimal, querysets, ...), so they keep DRF's format (e.g. `Z` for UTC). orjson writes
+    NaN and infinities as `null`; output that contains `null` is checked for them and rendered by DRF instead,
+    which raises under `STRICT_JSON`. Known differences: float exponents are written without padding
+    (`1e-5` instead of `1e-05`), and any requested indent (e.g. by the browsable API) renders with
+    orjson's two-space indent.
+    """
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        option = self.OPTIONS
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=option)
+        if b"null" in ret and has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape \u2028 and \u2029 like DRF, so the output stays a strict JavaScript subset.
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class ORJSONParser(BaseParser):
+    """Parses JSON request content with orjson."""
+
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f"JSON parse error - {e}")
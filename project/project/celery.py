@@ -20,8 +20,8 @@ app.conf.beat_schedule = {
         "task": "spotify_integration.tasks.refresh_all_spotify_tokens_task",
         "schedule": settings.REFRESH_ALL_SPOTIFY_TOKENS,  # 25 minutes by default
     },
-    "fetch_all_spotify_data_task": {
-        "task": "spotify_integration.tasks.fetch_all_spotify_data_task",
-        "schedule": settings.FETCH_ALL_SPOTIFY_DATA,  # 30 minutes by default
+    "fetch_scheduled_spotify_data_task": {
+        "task": "spotify_integration.tasks.fetch_scheduled_spotify_data_task",
+        "schedule": settings.SPOTIFY_SYNC_SLOT_SECONDS,  # Every slot, 1 minute by default
     },
 }
@@ -10,7 +10,11 @@ SECRET_KEY = env.str("DJANGO_SECRET_KEY")
 DEBUG = env.bool("DJANGO_DEBUG", default=False)
 ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS")
 FERNET_KEY = env.str("FERNET_KEY")  # Fernet key for encrypting sensitive data (access tokens, etc.)
+FERNET_PREVIOUS_KEYS = env.list("FERNET_PREVIOUS_KEYS", default=[])  # Old keys, still accepted for decryption
 BATCH_SIZE = env.int("BATCH_SIZE", default=500)  # Default batch size for bulk operations
+# Reconcile social posts inside PostgreSQL through a staging table instead of diffing in Python
+SOCIAL_POSTS_SQL_RECONCILIATION = env.bool("SOCIAL_POSTS_SQL_RECONCILIATION", default=True)
+SOCIAL_POSTS_COPY_THRESHOLD = env.int("SOCIAL_POSTS_COPY_THRESHOLD", default=2000)  # New rows to switch to COPY
 LOGIN_REDIRECT_URL = '/'  # Redirect here after successful login
 LOGOUT_REDIRECT_URL = '/'  # Redirect here after logout
 
@@ -34,10 +38,29 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_ENABLE_UTC = True
+SPOTIFY_FETCH_QUEUE = env.str('SPOTIFY_FETCH_QUEUE', 'spotify_fetch')  # I/O-bound: threads or gevent pool
+SPOTIFY_WRITE_QUEUE = env.str('SPOTIFY_WRITE_QUEUE', 'spotify_write')  # DB-bound: small prefork pool
+CELERY_TASK_ROUTES = {
+    "spotify_integration.tasks.fetch_spotify_collection_task": {"queue": SPOTIFY_FETCH_QUEUE},
+    "spotify_integration.tasks.write_spotify_collection_task": {"queue": SPOTIFY_WRITE_QUEUE},
+    "spotify_integration.tasks.finish_spotify_sync_task": {"queue": SPOTIFY_WRITE_QUEUE},
+    **env.json('CELERY_TASK_ROUTES', default={}),  # Overrides, e.g. {"<task name>": {"queue": "<queue>"}}
+}
 
 # Celery Beat Configuration
 REFRESH_ALL_SPOTIFY_TOKENS = env.int('REFRESH_ALL_SPOTIFY_TOKENS', 1500)  # Default 25 minutes.
 FETCH_ALL_SPOTIFY_DATA = env.int('FETCH_ALL_SPOTIFY_DATA', 1800)  # Default 30 minutes.
+SPOTIFY_SYNC_SLOT_SECONDS = env.int('SPOTIFY_SYNC_SLOT_SECONDS', 60)  # Users are enqueued in slots of this length.
+SPOTIFY_SYNC_MAX_SLOTS_PER_TICK = env.int('SPOTIFY_SYNC_MAX_SLOTS_PER_TICK', 2)  # Catch-up after missed ticks.
+SPOTIFY_SYNC_MIN_INTERVAL = env.int('SPOTIFY_SYNC_MIN_INTERVAL', FETCH_ALL_SPOTIFY_DATA)  # After changes or a login.
+SPOTIFY_SYNC_MAX_INTERVAL = env.int('SPOTIFY_SYNC_MAX_INTERVAL', 86400)  # Cap for unchanged libraries, 1 day.
+SPOTIFY_SYNC_BACKOFF_FACTOR = env.float('SPOTIFY_SYNC_BACKOFF_FACTOR', 2.0)  # Interval growth per unchanged sync.
+SPOTIFY_SYNC_DEDUP_MODE = env.str('SPOTIFY_SYNC_DEDUP_MODE', 'coalesce')  # Duplicate syncs: "coalesce" or "drop".
+SPOTIFY_SYNC_LEASE_TTL = env.int('SPOTIFY_SYNC_LEASE_TTL', 900)  # Seconds a sync may hold a collection lease.
+SPOTIFY_SPLIT_SYNC_PIPELINE = env.bool('SPOTIFY_SPLIT_SYNC_PIPELINE', False)  # Fetch and write on separate queues.
+SPOTIFY_SYNC_PAYLOAD_TTL = env.int('SPOTIFY_SYNC_PAYLOAD_TTL', 3600)  # Seconds fetched data waits for the write stage.
+SPOTIFY_SYNC_JOB_TTL = env.int('SPOTIFY_SYNC_JOB_TTL', 86400)  # Seconds a sync job status stays available.
+SPOTIFY_SYNC_RAW_DEBUG = env.bool('SPOTIFY_SYNC_RAW_DEBUG', DEBUG)  # Allow `?debug=raw` on sync endpoints.
 
 # Spotify Integration Settings
 SPOTIFY_CLIENT_ID = env.str("SPOTIFY_CLIENT_ID")
@@ -45,6 +68,26 @@ SPOTIFY_CLIENT_SECRET = env.str("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = env.str("SPOTIFY_REDIRECT_URI")
 DEFAULT_LIMIT = 50  # Default limit for paginated responses
 MAX_THREADS = 10  # Maximum number of threads for concurrent requests
+SPOTIFY_INCREMENTAL_SYNC = env.bool("SPOTIFY_INCREMENTAL_SYNC", default=True)  # Fetch only newly saved tracks
+SPOTIFY_MAX_PAGES_IN_FLIGHT = env.int("SPOTIFY_MAX_PAGES_IN_FLIGHT", default=MAX_THREADS * 2)  # Streamed sync window
+SPOTIFY_DISPATCH_CHUNK_SIZE = env.int("SPOTIFY_DISPATCH_CHUNK_SIZE", default=1000)  # Users per published group
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_HTTP_POOL_SIZE = env.int("SPOTIFY_HTTP_POOL_SIZE", default=MAX_THREADS)  # Keep-alive connections per worker
+SPOTIFY_HTTP_CONNECT_TIMEOUT = env.float("SPOTIFY_HTTP_CONNECT_TIMEOUT", default=5.0)  # Seconds
+SPOTIFY_HTTP_READ_TIMEOUT = env.float("SPOTIFY_HTTP_READ_TIMEOUT", default=15.0)  # Seconds
+SPOTIFY_ASYNC_MAX_CONCURRENCY = env.int("SPOTIFY_ASYNC_MAX_CONCURRENCY", default=200)  # In-flight requests per loop
+SPOTIFY_RATE_LIMIT_ENABLED = env.bool("SPOTIFY_RATE_LIMIT_ENABLED", default=True)  # Shared token bucket in Redis
+SPOTIFY_RATE_LIMIT_RATE = env.float("SPOTIFY_RATE_LIMIT_RATE", default=10.0)  # Requests per second for all workers
+SPOTIFY_RATE_LIMIT_BURST = env.int("SPOTIFY_RATE_LIMIT_BURST", default=20)  # Bucket capacity
+SPOTIFY_RATE_LIMIT_MAX_RETRIES = env.int("SPOTIFY_RATE_LIMIT_MAX_RETRIES", default=3)  # Retries after 429 responses
+SPOTIFY_TOKEN_CACHE_SIZE = env.int("SPOTIFY_TOKEN_CACHE_SIZE", default=10000)  # Access tokens cached per process
+SPOTIFY_TOKEN_CACHE_REDIS = env.bool("SPOTIFY_TOKEN_CACHE_REDIS", default=True)  # Share encrypted tokens via Redis
+SPOTIFY_TOKEN_CACHE_EXPIRY_MARGIN = env.int("SPOTIFY_TOKEN_CACHE_EXPIRY_MARGIN", default=60)  # Seconds before expiry
+# Refresh tokens expiring before the next refresh run, plus a margin. Seconds.
+SPOTIFY_TOKEN_REFRESH_WINDOW = env.int("SPOTIFY_TOKEN_REFRESH_WINDOW", default=REFRESH_ALL_SPOTIFY_TOKENS + 600)
+SPOTIFY_TOKEN_REFRESH_CONCURRENCY = env.int("SPOTIFY_TOKEN_REFRESH_CONCURRENCY", default=MAX_THREADS)  # Parallel
+SPOTIFY_TOKEN_REFRESH_CHUNK_SIZE = env.int("SPOTIFY_TOKEN_REFRESH_CHUNK_SIZE", default=500)  # Per bulk_update
+SPOTIFY_TOKEN_REFRESH_LOCK_TIMEOUT = env.int("SPOTIFY_TOKEN_REFRESH_LOCK_TIMEOUT", default=30)  # Seconds
 
 REDIS_URL = env.str("REDIS_URL")
 REDIS_OAUTH_STATE_EXPIRE = 60  # 60 seconds for OAuth state expiration
@@ -58,12 +101,21 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'json_handlers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'json_handlers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DATETIME_FORMAT': '%Y-%m-%dT%H:%M:%S.%fZ',
 }
 
+SOCIAL_FEED_MAX_PAGE_SIZE = env.int('SOCIAL_FEED_MAX_PAGE_SIZE', 200)  # Largest page of the feed endpoint
+SOCIAL_FEED_CACHE = env.bool('SOCIAL_FEED_CACHE', True)  # Cache feed pages in Redis
+SOCIAL_FEED_CACHE_TTL = env.int('SOCIAL_FEED_CACHE_TTL', 3600)  # Seconds a cached feed page is kept
+
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_COOKIE_HTTPONLY = True
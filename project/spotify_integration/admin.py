@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from spotify_integration.models import SocialCredential, SocialPost
+from spotify_integration.models import SocialCredential, SocialPost, SocialSyncSchedule, SocialSyncState
 
 
 @admin.register(SocialCredential)
@@ -17,3 +17,19 @@ class SocialPostAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "platform", "post_type")
     list_filter = ("platform", "post_type")
     readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(SocialSyncState)
+class SocialSyncStateAdmin(admin.ModelAdmin):
+    list_display = ("user", "platform", "post_type", "last_posted_at", "total_count", "updated_at")
+    search_fields = ("user__username",)
+    list_filter = ("platform", "post_type")
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(SocialSyncSchedule)
+class SocialSyncScheduleAdmin(admin.ModelAdmin):
+    list_display = ("user", "platform", "sync_interval", "last_synced_at", "last_changed_at", "next_sync_at")
+    search_fields = ("user__username",)
+    list_filter = ("platform",)
+    readonly_fields = ("created_at", "updated_at")
@@ -0,0 +1,28 @@
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, MultiFernet
+from django.conf import settings
+
+
+@lru_cache(maxsize=1)
+def get_cipher() -> MultiFernet:
+    """
+    Return the process-wide token cipher.
+    `FERNET_KEY` encrypts new tokens; it and `FERNET_PREVIOUS_KEYS` are tried for decryption,
+    so tokens encrypted before a key rotation stay readable until they are re-encrypted.
+    """
+    keys = [settings.FERNET_KEY, *settings.FERNET_PREVIOUS_KEYS]
+    return MultiFernet([Fernet(key.encode()) for key in keys])
+
+
+def encrypt_token(token: str) -> bytes:
+    return get_cipher().encrypt(token.encode())
+
+
+def decrypt_token(encrypted_token: bytes) -> str:
+    return get_cipher().decrypt(bytes(encrypted_token)).decode()
+
+
+def rotate_token(encrypted_token: bytes) -> bytes:
+    """Re-encrypt a token with the current primary key."""
+    return get_cipher().rotate(bytes(encrypted_token))
@@ -0,0 +1,114 @@
+# project/spotify_integration/management/commands/benchmark_json.py
+import json
+import timeit
+
+import orjson
+from django.core.management.base import BaseCommand
+from json_handlers import ORJSONRenderer
+from rest_framework.renderers import JSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib json and orjson on Spotify track pages and API response envelopes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=50, help="Number of tracks per page")
+        parser.add_argument("--number", type=int, default=1000, help="Number of calls per run")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of runs per case")
+
+    def handle(self, *args, **options):
+        page = self.generate_tracks_page(options["items"])
+        page_bytes = json.dumps(page).encode()
+        envelope = {"status": "ok", "message": "Success", "data": self.generate_feed_page(options["items"])}
+        json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+
+        cases = {
+            "decode tracks page": (lambda: json.loads(page_bytes), lambda: orjson.loads(page_bytes)),
+            "encode tracks page": (lambda: json.dumps(page).encode(), lambda: orjson.dumps(page)),
+            "render response envelope": (
+                lambda: json_renderer.render(envelope, "application/json"),
+                lambda: orjson_renderer.render(envelope, "application/json"),
+            ),
+        }
+
+        self.stdout.write(f"Tracks page: {len(page_bytes):,} bytes, {options['items']} items.")
+        for name, (stdlib_call, orjson_call) in cases.items():
+            stdlib = self.measure(stdlib_call, options["number"], options["repeat"])
+            fast = self.measure(orjson_call, options["number"], options["repeat"])
+            self.stdout.write(
+                f"{name:<26} json {stdlib * 1e6:8.1f}µs, orjson {fast * 1e6:8.1f}µs ({stdlib / fast:.1f}x)"
+            )
+
+    @staticmethod
+    def measure(call, number: int, repeat: int) -> float:
+        """Return the best time of one call in seconds."""
+        return min(timeit.repeat(call, number=number, repeat=repeat)) / number
+
+    @staticmethod
+    def generate_tracks_page(items: int) -> dict:
+        """Build a page shaped like a `/me/tracks` response."""
+        return {
+            "href": f"https://api.spotify.com/v1/me/tracks?offset=0&limit={items}",
+            "limit": items,
+            "offset": 0,
+            "total": items * 20,
+            "next": f"https://api.spotify.com/v1/me/tracks?offset={items}&limit={items}",
+            "items": [
+                {
+                    "added_at": f"2024-05-{index % 28 + 1:02d}T12:00:00Z",
+                    "track": {
+                        "id": f"track{index:018d}",
+                        "name": f"Benchmark track {index}",
+                        "duration_ms": 180000 + index,
+                        "explicit": False,
+                        "popularity": index % 100,
+                        "external_urls": {"spotify": f"https://open.spotify.com/track/benchmark{index}"},
+                        "artists": [
+                            {
+                                "id": f"artist{index:017d}",
+                                "name": f"Benchmark artist {index}",
+                                "external_urls": {"spotify": f"https://open.spotify.com/artist/benchmark{index}"},
+                            },
+                        ],
+                        "album": {
+                            "id": f"album{index:018d}",
+                            "name": f"Benchmark album {index}",
+                            "images": [
+                                {"height": size, "width": size, "url": f"https://i.scdn.co/image/{index}-{size}"}
+                                for size in (640, 300, 64)
+                            ],
+                        },
+                    },
+                }
+                for index in range(items)
+            ],
+        }
+
+    @staticmethod
+    def generate_feed_page(items: int) -> dict:
+        """Build a page shaped like the `/spotify/feed/` response data."""
+        return {
+            "results": [
+                {
+                    "id": index,
+                    "platform": "spotify",
+                    "post_type": "tracks",
+                    "external_id": f"track{index:018d}",
+                    "external_url": f"https://open.spotify.com/track/benchmark{index}",
+                    "external_username": f"Benchmark artist {index}",
+                    "external_user_url": f"https://open.spotify.com/artist/benchmark{index}",
+                    "posted_at": f"2024-05-{index % 28 + 1:02d}T12:00:00.000000Z",
+                    "title": f"Benchmark track {index}",
+                    "text": None,
+                    "videos_url": [],
+                    "images_url": [
+                        {"height": size, "width": size, "url": f"https://i.scdn.co/image/{index}-{size}"}
+                        for size in (640, 300, 64)
+                    ],
+                    "links_url": [],
+                }
+                for index in range(items)
+            ],
+            "next_cursor": "WyIyMDI0LTA1LTAxVDEyOjAwOjAwKzAwOjAwIiwgNDJd",
+            "next": "http://localhost:8000/spotify/feed/?post_type=tracks&cursor=WyIyMDI0LTA1LTAxVDEyOjAwOjAwKzAwOjAwIiwgNDJd",
+        }
@@ -0,0 +1,94 @@
+# project/spotify_integration/management/commands/benchmark_social_feed.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from spotify_integration.models import SocialPost
+from spotify_integration.services import SocialFeedService
+
+
+class Command(BaseCommand):
+    help = "Compare keyset and OFFSET pagination of the social post feed on shallow and deep pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Number of posts of the benchmark user")
+        parser.add_argument("--page-size", type=int, default=50, help="Number of posts per page")
+        parser.add_argument("--pages", type=str, default="1,10,100,1000",
+                            help="Comma-separated page numbers to measure")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of runs per page")
+
+    def handle(self, *args, **options):
+        rows, page_size, repeat = options["rows"], options["page_size"], options["repeat"]
+        page_numbers = [int(page) for page in options["pages"].split(",")]
+        feed_service = SocialFeedService()
+
+        with transaction.atomic():
+            user = User.objects.create(username=f"benchmark-{time.monotonic_ns()}")
+            self.create_posts(user, rows)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {SocialPost._meta.db_table}")
+
+            posts = feed_service.get_queryset(user, "spotify", "tracks")
+            for page_number in page_numbers:
+                offset = (page_number - 1) * page_size
+                if offset >= rows:
+                    self.stdout.write(f"page {page_number:>6}: beyond {rows} rows, skipped")
+                    continue
+                cursor = feed_service.encode_cursor(posts[offset - 1]) if offset else None
+
+                keyset = self.measure(repeat, lambda: feed_service.get_page(
+                    user, "spotify", "tracks", page_size, cursor))
+                offset_page = self.measure(repeat, lambda: list(posts[offset:offset + page_size]))
+                self.stdout.write(
+                    f"page {page_number:>6}: keyset {keyset[0] * 1000:8.2f}ms ({keyset[1]} queries), "
+                    f"OFFSET {offset_page[0] * 1000:8.2f}ms ({offset_page[1]} queries)"
+                )
+
+            if connection.vendor == "postgresql" and options["verbosity"] > 1:
+                deepest = min(max(page_numbers) - 1, (rows - 1) // page_size) * page_size
+                cursor = feed_service.encode_cursor(posts[deepest - 1]) if deepest else None
+                with CaptureQueriesContext(connection) as queries:
+                    feed_service.get_page(user, "spotify", "tracks", page_size, cursor)
+                with connection.cursor() as db_cursor:
+                    db_cursor.execute(f"EXPLAIN ANALYZE {queries[-1]['sql']}")
+                    self.stdout.write("\n".join(row[0] for row in db_cursor.fetchall()))
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(repeat: int, run) -> tuple[float, int]:
+        """Return the best time of `repeat` runs and the number of queries of one run."""
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+        return min(timings), len(queries)
+
+    @staticmethod
+    def create_posts(user: User, rows: int) -> None:
+        # Several posts share each date, so pages also have to break ties by id.
+        now = timezone.now()
+        SocialPost.objects.bulk_create(
+            (
+                SocialPost(
+                    user=user,
+                    platform="spotify",
+                    post_type="tracks",
+                    external_id=f"track_{index}",
+                    external_url=f"https://open.spotify.com/track/benchmark{index}",
+                    external_username="benchmark",
+                    posted_at=now - timedelta(minutes=index // 3),
+                    title=f"Benchmark track {index}",
+                )
+                for index in range(rows)
+            ),
+            batch_size=settings.BATCH_SIZE,
+        )
@@ -0,0 +1,78 @@
+# project/spotify_integration/management/commands/benchmark_social_posts_load.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from spotify_integration.models import SocialPost
+from spotify_integration.reconciliation import PostgresSocialPostReconciler
+from spotify_integration.schemes import SocialPostScheme
+
+
+class Command(BaseCommand):
+    help = "Compare bulk_create, staged INSERT and COPY loading of a first-time library import"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Number of posts to load")
+        parser.add_argument("--repeat", type=int, default=3, help="Number of runs per loader")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The benchmark requires PostgreSQL.")
+
+        rows, repeat = options["rows"], options["repeat"]
+        posts = self.generate_posts(rows)
+        loaders = {
+            f"bulk_create (batches of {settings.BATCH_SIZE})": self.load_bulk_create,
+            "staging table via INSERT": lambda user: self.load_staged(user, posts, use_copy=False),
+            "staging table via COPY": lambda user: self.load_staged(user, posts, use_copy=True),
+        }
+
+        for name, loader in loaders.items():
+            timings = []
+            for _ in range(repeat):
+                with transaction.atomic():
+                    user = User.objects.create(username=f"benchmark-{time.monotonic_ns()}")
+                    started = time.perf_counter()
+                    if name.startswith("bulk_create"):
+                        loader(user, posts)
+                    else:
+                        loader(user)
+                    timings.append(time.perf_counter() - started)
+                    transaction.set_rollback(True)
+            best = min(timings)
+            self.stdout.write(f"{name:<40} best {best:.3f}s, {rows / best:,.0f} rows/s")
+
+    @staticmethod
+    def generate_posts(rows: int) -> list[SocialPostScheme]:
+        now = timezone.now()
+        return [
+            SocialPostScheme(
+                platform="spotify",
+                external_id=f"track_{index}",
+                external_url=f"https://open.spotify.com/track/benchmark{index}",
+                external_username="benchmark",
+                external_user_url="https://open.spotify.com/user/benchmark",
+                posted_at=now - timedelta(minutes=index),
+                title=f"Benchmark track {index}",
+                images_url=[{"height": 640, "width": 640, "url": f"https://i.scdn.co/image/{index}"}],
+            )
+            for index in range(rows)
+        ]
+
+    @staticmethod
+    def load_bulk_create(user: User, posts: list[SocialPostScheme]) -> None:
+        instances = [SocialPost.from_scheme(user, "spotify", "tracks", post) for post in posts]
+        for batch_start_index in range(0, len(instances), settings.BATCH_SIZE):
+            SocialPost.objects.bulk_create(
+                instances[batch_start_index:batch_start_index + settings.BATCH_SIZE],
+                ignore_conflicts=True
+            )
+
+    @staticmethod
+    def load_staged(user: User, posts: list[SocialPostScheme], use_copy: bool) -> None:
+        chunks = (posts[index:index + settings.DEFAULT_LIMIT] for index in range(0, len(posts), settings.DEFAULT_LIMIT))
+        PostgresSocialPostReconciler(SocialPost, user, "spotify", "tracks", use_copy=use_copy).reconcile(chunks)
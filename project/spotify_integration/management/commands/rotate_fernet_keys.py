@@ -0,0 +1,50 @@
+# project/spotify_integration/management/commands/rotate_fernet_keys.py
+from cryptography.fernet import InvalidToken
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from spotify_integration.crypto import rotate_token
+from spotify_integration.models import SocialCredential
+
+
+class Command(BaseCommand):
+    help = "Re-encrypt all stored Spotify tokens with the current FERNET_KEY after a key rotation"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=settings.BATCH_SIZE,
+                            help="Number of credentials re-encrypted per transaction")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        credentials = SocialCredential.objects.only("pk", "access_token", "refresh_token").order_by("pk")
+        rotated = failed = 0
+
+        chunk = []
+        for credential in credentials.iterator(chunk_size=chunk_size):
+            chunk.append(credential)
+            if len(chunk) >= chunk_size:
+                rotated, failed = self.rotate_chunk(chunk, rotated, failed)
+                chunk = []
+        if chunk:
+            rotated, failed = self.rotate_chunk(chunk, rotated, failed)
+
+        self.stdout.write(self.style.SUCCESS(f"Re-encrypted tokens for {rotated} credentials."))
+        if failed:
+            self.stderr.write(f"Failed to decrypt tokens for {failed} credentials with the configured keys.")
+
+    def rotate_chunk(self, chunk: list[SocialCredential], rotated: int, failed: int) -> tuple[int, int]:
+        credentials_to_update = []
+        for credential in chunk:
+            try:
+                credential.access_token = rotate_token(credential.access_token)
+                if credential.refresh_token:
+                    credential.refresh_token = rotate_token(credential.refresh_token)
+            except InvalidToken:
+                self.stderr.write(f"Cannot decrypt tokens of credential {credential.pk}.")
+                failed += 1
+                continue
+            credentials_to_update.append(credential)
+
+        with transaction.atomic():
+            SocialCredential.objects.bulk_update(credentials_to_update, ["access_token", "refresh_token"])
+        return rotated + len(credentials_to_update), failed
@@ -0,0 +1,38 @@
+# project/spotify_integration/management/commands/show_spotify_metrics.py
+from django.core.management.base import BaseCommand
+from spotify_integration.services.feed_cache import SocialFeedCache
+from spotify_integration.services.rate_limiter import SpotifyRateLimiter
+from spotify_integration.services.sync_lease import SyncLeaseService
+from spotify_integration.services.token_cache import get_access_token_cache
+
+
+class Command(BaseCommand):
+    help = "Show cluster-wide Spotify integration metrics"
+
+    def handle(self, *args, **options):
+        limiter_stats = SpotifyRateLimiter().get_stats()
+        self.stdout.write(
+            f"Rate limiter: waited {limiter_stats['wait_seconds']:.2f}s in {limiter_stats['waits']} waits, "
+            f"{limiter_stats['throttled']} responses with status 429."
+        )
+
+        token_cache_stats = get_access_token_cache().get_stats()
+        lookups = sum(token_cache_stats.values())
+        hits = token_cache_stats["local_hits"] + token_cache_stats["redis_hits"]
+        self.stdout.write(
+            f"Access token cache: {token_cache_stats['local_hits']} local hits, "
+            f"{token_cache_stats['redis_hits']} Redis hits, {token_cache_stats['misses']} misses "
+            f"(hit ratio {hits / lookups if lookups else 0:.1%})."
+        )
+
+        lease_stats = SyncLeaseService().get_stats()
+        self.stdout.write(
+            f"Sync dedup: {lease_stats['suppressed']} duplicate syncs suppressed, "
+            f"{lease_stats['coalesced']} coalesced into a rerun."
+        )
+
+        feed_cache_stats = SocialFeedCache().get_stats()
+        self.stdout.write(
+            f"Feed cache: {feed_cache_stats['hits']} hits, {feed_cache_stats['misses']} misses "
+            f"(hit ratio {feed_cache_stats['hit_ratio']:.1%})."
+        )
@@ -1,23 +1,30 @@
 # project/spotify_integration/management/commands/sync_spotify_data.py
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from spotify_integration.models import SocialCredential
-from spotify_integration.tasks import (
-    fetch_spotify_following_task,
-    fetch_spotify_playlists_task,
-    fetch_spotify_tracks_task,
-)
+from spotify_integration.tasks import dispatch_spotify_sync
 
 
 class Command(BaseCommand):
     help = "Sync Spotify data for all users with valid credentials"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.SPOTIFY_DISPATCH_CHUNK_SIZE,
+            help="Number of users published per group",
+        )
+
     def handle(self, *args, **options):
-        users = SocialCredential.objects.filter(
-            platform="spotify",
-            refresh_token__isnull=False
-        ).exclude(refresh_token=b"").values_list("user_id", flat=True)
-        for user_id in users:
-            fetch_spotify_tracks_task.delay(user_id)
-            fetch_spotify_playlists_task.delay(user_id)
-            fetch_spotify_following_task.delay(user_id)
-        self.stdout.write(self.style.SUCCESS(f"Triggered sync for {len(users)} users."))
\ No newline at end of file
+        chunk_size = options["chunk_size"]
+        started_at = time.monotonic()
+        user_ids = SocialCredential.objects.get_syncable_user_ids().iterator(chunk_size=chunk_size)
+        dispatched = dispatch_spotify_sync(user_ids, chunk_size=chunk_size)
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f"Triggered sync for {dispatched} users in {elapsed:.2f}s "
+            f"({dispatched / elapsed if elapsed else 0:.0f} users/s)."
+        ))
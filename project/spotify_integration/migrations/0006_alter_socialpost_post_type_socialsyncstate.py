@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_integration', '0005_socialpost_external_user_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='socialpost',
+            name='post_type',
+            field=models.CharField(choices=[('tracks', 'Tracks'), ('playlists', 'Playlists'), ('following', 'Follows')], db_index=True, max_length=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='SocialSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('spotify', 'Spotify')], max_length=50, verbose_name='Social media platform')),
+                ('post_type', models.CharField(choices=[('tracks', 'Tracks'), ('playlists', 'Playlists'), ('following', 'Follows')], max_length=20)),
+                ('last_posted_at', models.DateTimeField(blank=True, null=True, verbose_name='Newest known date of event')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Number of items on the platform')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='social_sync_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'social_sync_states',
+                'unique_together': {('user', 'platform', 'post_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_integration', '0006_alter_socialpost_post_type_socialsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='socialpost',
+            name='snapshot_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Version of the entity (e.g. playlist snapshot)'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_integration', '0007_socialpost_snapshot_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='socialpost',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Fingerprint of the content'),
+        ),
+        migrations.AlterField(
+            model_name='socialpost',
+            name='external_id',
+            field=models.CharField(max_length=50, verbose_name='External post ID'),
+        ),
+        migrations.AlterField(
+            model_name='socialpost',
+            name='external_url',
+            field=models.URLField(max_length=250, verbose_name='Link to entity (song, artist, etc...) on Spotify'),
+        ),
+    ]
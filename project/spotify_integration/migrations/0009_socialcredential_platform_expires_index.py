@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_integration', '0008_socialpost_content_hash_alter_socialpost_external_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='socialcredential',
+            index=models.Index(fields=['platform', 'expires_at'], name='social_cred_platform_expires'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_integration', '0009_socialcredential_platform_expires_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocialSyncSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('spotify', 'Spotify')], max_length=50, verbose_name='Social media platform')),
+                ('sync_interval', models.DurationField(verbose_name='Current interval between syncs')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True, verbose_name='Last sync that found changes')),
+                ('next_sync_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='social_sync_schedules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'social_sync_schedules',
+                'indexes': [models.Index(fields=['platform', 'next_sync_at'], name='social_sched_platform_next')],
+                'unique_together': {('user', 'platform')},
+            },
+        ),
+    ]
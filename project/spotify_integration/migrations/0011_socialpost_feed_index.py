@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+FEED_INDEX = models.Index(fields=['user', 'platform', 'post_type', 'posted_at', 'id'], name='social_posts_feed')
+
+
+def add_feed_index(apps, schema_editor):
+    # social_posts is the largest table: on PostgreSQL build the index without blocking writes.
+    model = apps.get_model('spotify_integration', 'SocialPost')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(model, FEED_INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(model, FEED_INDEX)
+
+
+def remove_feed_index(apps, schema_editor):
+    model = apps.get_model('spotify_integration', 'SocialPost')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(model, FEED_INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(model, FEED_INDEX)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('spotify_integration', '0010_socialsyncschedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='socialpost', index=FEED_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_feed_index, remove_feed_index),
+            ],
+        ),
+    ]
@@ -1,10 +1,14 @@
-from cryptography.fernet import Fernet
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.utils import timezone
 
-from spotify_integration.schemes import SocialPostScheme
+from spotify_integration import crypto
+from spotify_integration.reconciliation import PostgresSocialPostReconciler
+from spotify_integration.schemes import SocialPostScheme, SocialPostSyncResult
 
 PLATFORM_CHOICES = [
     ("spotify", "Spotify"),
@@ -16,13 +20,11 @@ class EncryptedFieldMixin:
 
     @staticmethod
     def encrypt_token(token: str) -> bytes:
-        fernet = Fernet(settings.FERNET_KEY.encode())
-        return fernet.encrypt(token.encode())
+        return crypto.encrypt_token(token)
 
     @staticmethod
     def decrypt_token(encrypted_token: bytes) -> str:
-        fernet = Fernet(settings.FERNET_KEY.encode())
-        return fernet.decrypt(encrypted_token).decode()
+        return crypto.decrypt_token(encrypted_token)
 
 
 class SocialCredentialManager(models.Manager):
@@ -34,6 +36,21 @@ class SocialCredentialManager(models.Manager):
             return credential.access_token_value
         return None
 
+    def get_access_token_with_expiry(self, user: User) -> tuple[str, datetime] | None:
+        """Retrieve the access token for a given user together with its expiry time.
+        If the token is expired, it returns None."""
+        credential = self.filter(user=user, platform="spotify").first()
+        if credential and not credential.is_expired:
+            return credential.access_token_value, credential.expires_at
+        return None
+
+    def get_syncable_user_ids(self) -> models.QuerySet:
+        """Return IDs of users whose Spotify credentials have a refresh token, i.e. users to synchronize."""
+        return self.filter(
+            platform="spotify",
+            refresh_token__isnull=False,
+        ).exclude(refresh_token=b"").values_list("user_id", flat=True)
+
 
 class SocialCredential(models.Model, EncryptedFieldMixin):
     """Model to store social credentials for users."""
@@ -68,6 +85,9 @@ class SocialCredential(models.Model, EncryptedFieldMixin):
     class Meta:
         db_table = "social_credentials"
         unique_together = ["user", "platform"]
+        indexes = [
+            models.Index(fields=["platform", "expires_at"], name="social_cred_platform_expires"),
+        ]
 
     objects = SocialCredentialManager()
 
@@ -83,8 +103,7 @@ class SocialCredential(models.Model, EncryptedFieldMixin):
     @access_token_value.setter
     def access_token_value(self, token: str):
         """Encrypt and set the access token."""
-        fernet = Fernet(settings.FERNET_KEY.encode())
-        self.access_token = fernet.encrypt(token.encode())
+        self.access_token = self.encrypt_token(token)
 
     @property
     def refresh_token_value(self):
@@ -97,8 +116,7 @@ class SocialCredential(models.Model, EncryptedFieldMixin):
     def refresh_token_value(self, token: str):
         """Encrypt and set the refresh token."""
         if token:
-            fernet = Fernet(settings.FERNET_KEY.encode())
-            self.refresh_token = fernet.encrypt(token.encode())
+            self.refresh_token = self.encrypt_token(token)
         else:
             self.refresh_token = None
 
@@ -130,9 +148,8 @@ class SocialPost(models.Model):
         verbose_name="Social media platform",
     )
     post_type = models.CharField(max_length=20, choices=POST_TYPE_CHOICES, db_index=True, null=True)
-    external_id = models.CharField(max_length=50, unique=True, verbose_name="External post ID")
-    external_url = models.URLField(max_length=250, unique=True,
-                                   verbose_name="Link to entity (song, artist, etc...) on Spotify")
+    external_id = models.CharField(max_length=50, verbose_name="External post ID")
+    external_url = models.URLField(max_length=250, verbose_name="Link to entity (song, artist, etc...) on Spotify")
     external_username = models.CharField(max_length=100, verbose_name="Link to user's profile on Spotify")
     external_user_url = models.URLField(max_length=250, null=True, blank=True,
                                         verbose_name="Link to external user profile")
@@ -142,80 +159,272 @@ class SocialPost(models.Model):
     videos_url = models.JSONField(null=True, blank=True, verbose_name="Videos URL")
     images_url = models.JSONField(null=True, blank=True, verbose_name="Images URL")
     links_url = models.JSONField(null=True, blank=True, verbose_name="Links URL")
+    snapshot_id = models.CharField(max_length=100, null=True, blank=True,
+                                   verbose_name="Version of the entity (e.g. playlist snapshot)")
+    content_hash = models.CharField(max_length=64, null=True, blank=True, verbose_name="Fingerprint of the content")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    UPSERT_FIELDS = [
+        "post_type", "external_id", "external_username", "external_user_url", "posted_at", "title", "text",
+        "videos_url", "images_url", "links_url", "snapshot_id", "content_hash", "updated_at",
+    ]
+
     class Meta:
         db_table = "social_posts"
         unique_together = ["user", "platform", "external_url"]
+        indexes = [
+            # Feed pages are keyset range scans in (posted_at, id) order, see `SocialFeedService`.
+            models.Index(fields=["user", "platform", "post_type", "posted_at", "id"], name="social_posts_feed"),
+        ]
 
     def __str__(self):
         return f"Post on {self.platform} by {self.user.username}"
 
+    @classmethod
+    def from_scheme(cls, user: User, platform: str, post_type: str, post: SocialPostScheme) -> "SocialPost":
+        """Build an unsaved model instance from a mapped social post."""
+        return cls(
+            user=user,
+            platform=platform,
+            post_type=post_type,
+            external_id=post.external_id,
+            external_url=post.external_url,
+            external_username=post.external_username,
+            external_user_url=post.external_user_url,
+            posted_at=post.posted_at,
+            title=post.title,
+            text=post.text,
+            videos_url=[video.model_dump() for video in (post.videos_url or [])],
+            images_url=[image.model_dump() for image in (post.images_url or [])],
+            links_url=[link.model_dump() for link in (post.links_url or [])],
+            snapshot_id=post.snapshot_id,
+            content_hash=post.content_hash(),
+        )
+
     @classmethod
     @transaction.atomic
+    def add_social_posts(cls,
+                         user: User,
+                         platform: str,
+                         post_type: str,
+                         social_posts: list[SocialPostScheme]
+                         ) -> None:
+        """Insert new social posts without touching or removing existing ones."""
+        posts_to_create = [cls.from_scheme(user, platform, post_type, post) for post in social_posts]
+        for batch_start_index in range(0, len(posts_to_create), settings.BATCH_SIZE):
+            cls.objects.bulk_create(
+                posts_to_create[batch_start_index:batch_start_index + settings.BATCH_SIZE],
+                ignore_conflicts=True
+            )
+        if posts_to_create:
+            cls.bump_feed_version(user, platform, post_type)
+
+    @staticmethod
+    def bump_feed_version(user: User, platform: str, post_type: str) -> None:
+        """Invalidate the cached feed pages of a user's posts once the current transaction commits."""
+        if not settings.SOCIAL_FEED_CACHE:
+            return
+        from spotify_integration.services.feed_cache import SocialFeedCache  # Services import the models
+
+        transaction.on_commit(lambda: SocialFeedCache().bump(user.pk, platform, post_type))
+
+    @classmethod
     def bulk_update_social_posts(cls,
                                  user: User,
                                  platform: str,
                                  post_type: str,
                                  social_posts: list[SocialPostScheme]
-                                 ) -> None:
+                                 ) -> SocialPostSyncResult:
+        """Synchronize social posts for a user/platform/post_type from a complete list of posts."""
+        return cls.bulk_update_social_posts_stream(user, platform, post_type, [social_posts])
+
+    @classmethod
+    @transaction.atomic
+    def bulk_update_social_posts_stream(cls,
+                                        user: User,
+                                        platform: str,
+                                        post_type: str,
+                                        chunks: Iterable[list[SocialPostScheme]]
+                                        ) -> SocialPostSyncResult:
         """
-        Synchronize social posts for a user/platform/post_type:
+        Synchronize social posts for a user/platform/post_type from chunks (e.g. API pages) of posts:
         - Add new posts
-        - Do NOT update existing ones
+        - Rewrite existing posts only if their content fingerprint changed. Posts with the same
+          snapshot (e.g. playlist `snapshot_id`) or the same fingerprint are skipped
         - Remove only posts of the same (user, platform, post_type) that are missing
+        New and changed posts are written with batched `INSERT ... ON CONFLICT DO UPDATE`.
+        On PostgreSQL the diff runs inside the database (see `PostgresSocialPostReconciler`);
+        otherwise only one chunk and the set of seen URLs are kept in memory.
+        If anything changed, cached feed pages are invalidated after the transaction commits.
         """
-        if not social_posts:
-            cls.objects.filter(user=user, platform=platform, post_type=post_type).delete()
-            return
+        if connection.vendor == "postgresql" and settings.SOCIAL_POSTS_SQL_RECONCILIATION:
+            result = PostgresSocialPostReconciler(cls, user, platform, post_type).reconcile(chunks)
+        else:
+            result = cls._reconcile_social_posts(user, platform, post_type, chunks)
+        if result.has_changes:
+            cls.bump_feed_version(user, platform, post_type)
+        return result
 
-        incoming_by_url = {post.external_url: post for post in social_posts}
+    @classmethod
+    def _reconcile_social_posts(cls,
+                                user: User,
+                                platform: str,
+                                post_type: str,
+                                chunks: Iterable[list[SocialPostScheme]]
+                                ) -> SocialPostSyncResult:
+        result = SocialPostSyncResult()
+        user_posts = cls.objects.filter(user=user, platform=platform, post_type=post_type)
+        seen_urls = set()
+
+        for chunk in chunks:
+            incoming_by_url = {post.external_url: post for post in chunk if post.external_url not in seen_urls}
+            if not incoming_by_url:
+                continue
+            seen_urls.update(incoming_by_url)
+
+            existing_by_url = {
+                url: (snapshot_id, content_hash)
+                for url, snapshot_id, content_hash in user_posts.filter(
+                    external_url__in=list(incoming_by_url)
+                ).values_list("external_url", "snapshot_id", "content_hash")
+            }
+
+            posts_to_upsert = []
+            for url, post in incoming_by_url.items():
+                if url not in existing_by_url:
+                    result.created += 1
+                else:
+                    snapshot_id, content_hash = existing_by_url[url]
+                    if (post.snapshot_id and post.snapshot_id == snapshot_id) or post.content_hash() == content_hash:
+                        result.unchanged += 1
+                        continue
+                    result.updated += 1
+                posts_to_upsert.append(cls.from_scheme(user, platform, post_type, post))
 
-        existing_posts = cls.objects.filter(
-            user=user,
-            platform=platform,
-            post_type=post_type
-        ).only("external_url")
-
-        existing_urls = {post.external_url for post in existing_posts}
-        incoming_urls = set(incoming_by_url.keys())
-
-        urls_to_add = incoming_urls - existing_urls
-        urls_to_remove = existing_urls - incoming_urls
-
-        posts_to_create = []
-        for url in urls_to_add:
-            post = incoming_by_url[url]
-            posts_to_create.append(cls(
-                user=user,
-                platform=platform,
-                post_type=post_type,
-                external_id=post.external_id,
-                external_url=post.external_url,
-                external_username=post.external_username,
-                external_user_url=post.external_user_url,
-                posted_at=post.posted_at,
-                title=post.title,
-                text=post.text,
-                videos_url=[video.model_dump() for video in (post.videos_url or [])],
-                images_url=[image.model_dump() for image in (post.images_url or [])],
-                links_url=[link.model_dump() for link in (post.links_url or [])],
-            ))
-
-        # Bulk insert (ignores duplicates, if any)
-        for batch_start_index in range(0, len(posts_to_create), settings.BATCH_SIZE):
             cls.objects.bulk_create(
-                posts_to_create[batch_start_index:batch_start_index + settings.BATCH_SIZE],
-                ignore_conflicts=True
+                posts_to_upsert,
+                batch_size=settings.BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["user", "platform", "external_url"],
+                update_fields=cls.UPSERT_FIELDS,
             )
 
         # Remove redundant posts only for current user, platform, post_type
-        if urls_to_remove:
-            cls.objects.filter(
-                user=user,
-                platform=platform,
-                post_type=post_type,
-                external_url__in=list(urls_to_remove)
+        ids_to_remove = [
+            post_id
+            for post_id, url in user_posts.values_list("pk", "external_url").iterator(chunk_size=settings.BATCH_SIZE)
+            if url not in seen_urls
+        ]
+        for batch_start_index in range(0, len(ids_to_remove), settings.BATCH_SIZE):
+            deleted, _ = cls.objects.filter(
+                pk__in=ids_to_remove[batch_start_index:batch_start_index + settings.BATCH_SIZE]
             ).delete()
+            result.deleted += deleted
+        return result
+
+
+class SocialSyncState(models.Model):
+    """Model to store the synchronization high-water mark of a user's collection."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="social_sync_states",
+    )
+    platform = models.CharField(
+        max_length=50,
+        choices=PLATFORM_CHOICES,
+        verbose_name="Social media platform",
+    )
+    post_type = models.CharField(max_length=20, choices=SocialPost.POST_TYPE_CHOICES)
+    last_posted_at = models.DateTimeField(null=True, blank=True, verbose_name="Newest known date of event")
+    total_count = models.PositiveIntegerField(default=0, verbose_name="Number of items on the platform")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "social_sync_states"
+        unique_together = ["user", "platform", "post_type"]
+
+    def __str__(self):
+        return f"{self.platform} {self.post_type} sync state for {self.user.username}"
+
+
+class SocialSyncScheduleManager(models.Manager):
+    def record_sync(self,
+                    user: User,
+                    platform: str,
+                    changed: bool,
+                    complete: bool = True,
+                    ) -> "SocialSyncSchedule | None":
+        """Schedule the next sync after a finished one.
+        A change snaps the interval back to the minimum; otherwise the interval grows up to the maximum.
+        A sync of only some collections (`complete=False`) can only snap the interval back: finding nothing new
+        in one collection says nothing about the others, so it leaves the schedule alone."""
+        if not changed and not complete:
+            return None
+        now = timezone.now()
+        min_interval = timedelta(seconds=settings.SPOTIFY_SYNC_MIN_INTERVAL)
+        schedule, _ = self.get_or_create(
+            user=user, platform=platform, defaults={"sync_interval": min_interval, "next_sync_at": now},
+        )
+        if changed:
+            schedule.sync_interval = min_interval
+            schedule.last_changed_at = now
+        else:
+            schedule.sync_interval = min(
+                schedule.sync_interval * settings.SPOTIFY_SYNC_BACKOFF_FACTOR,
+                timedelta(seconds=settings.SPOTIFY_SYNC_MAX_INTERVAL),
+            )
+        schedule.last_synced_at = now
+        schedule.next_sync_at = now + schedule.sync_interval
+        schedule.save()
+        return schedule
+
+    def reset(self, user: User, platform: str) -> None:
+        """Go back to the minimum interval, e.g. after a login. The caller enqueues a sync right away,
+        so the next scheduled one is one minimum interval later, not on the next beat tick."""
+        min_interval = timedelta(seconds=settings.SPOTIFY_SYNC_MIN_INTERVAL)
+        self.update_or_create(
+            user=user,
+            platform=platform,
+            defaults={"sync_interval": min_interval, "next_sync_at": timezone.now() + min_interval},
+        )
+
+
+class SocialSyncSchedule(models.Model):
+    """Model to store when a user's library is synchronized next.
+    Libraries that do not change are synchronized less and less often."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="social_sync_schedules",
+    )
+    platform = models.CharField(
+        max_length=50,
+        choices=PLATFORM_CHOICES,
+        verbose_name="Social media platform",
+    )
+    sync_interval = models.DurationField(verbose_name="Current interval between syncs")
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_changed_at = models.DateTimeField(null=True, blank=True, verbose_name="Last sync that found changes")
+    next_sync_at = models.DateTimeField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "social_sync_schedules"
+        unique_together = ["user", "platform"]
+        indexes = [
+            models.Index(fields=["platform", "next_sync_at"], name="social_sched_platform_next"),
+        ]
+
+    objects = SocialSyncScheduleManager()
+
+    def __str__(self):
+        return f"{self.platform} sync schedule for {self.user.username}"
@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from spotify_integration.schemes import SocialPostScheme, SocialPostSyncResult
+
+
+class PostgresSocialPostReconciler:
+    """
+    Set-based reconciliation of a user's social posts inside PostgreSQL.
+
+    Incoming posts are streamed into a session-local temporary staging table. The upsert of new and
+    changed posts and the anti-join delete of missing ones then run as single SQL statements,
+    so neither the existing keys nor huge `IN (...)` lists travel between Python and the database.
+    Must run inside a transaction: the staging table is emptied on commit.
+
+    Large loads, such as the first import of a library, are staged with `COPY` instead of INSERTs:
+    once the number of new rows (staged rows minus rows already stored) reaches
+    `SOCIAL_POSTS_COPY_THRESHOLD`, the remaining chunks are copied.
+    """
+
+    STAGING_TABLE = "social_posts_staging"
+    COPY_BATCH_SIZE = 10000  # Rows buffered in memory per COPY
+    STAGING_COLUMNS = [
+        "external_url", "external_id", "external_username", "external_user_url", "posted_at", "title", "text",
+        "videos_url", "images_url", "links_url", "snapshot_id", "content_hash",
+    ]
+
+    def __init__(self, model, user, platform: str, post_type: str, use_copy: bool | None = None):
+        self.model = model
+        self.table = model._meta.db_table
+        self.user = user
+        self.platform = platform
+        self.post_type = post_type
+        self.use_copy = use_copy  # None chooses automatically by the number of new rows
+        self.staged = 0
+        self.existing = 0
+        self.copy_buffer = None
+        self.copy_writer = None
+        self.copy_rows = 0
+
+    def create_staging_table(self, cursor) -> None:
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE IF NOT EXISTS {self.STAGING_TABLE} (
+                external_url varchar(250) PRIMARY KEY,
+                external_id varchar(50) NOT NULL,
+                external_username varchar(100) NOT NULL,
+                external_user_url varchar(250),
+                posted_at timestamp with time zone,
+                title varchar(255),
+                text text,
+                videos_url jsonb,
+                images_url jsonb,
+                links_url jsonb,
+                snapshot_id varchar(100),
+                content_hash varchar(64)
+            ) ON COMMIT DELETE ROWS
+        """)
+        cursor.execute(f"TRUNCATE {self.STAGING_TABLE}")
+
+    def staging_row(self, post: SocialPostScheme) -> tuple:
+        return (
+            post.external_url,
+            post.external_id,
+            post.external_username,
+            post.external_user_url,
+            post.posted_at,
+            post.title,
+            post.text,
+            json.dumps([video.model_dump() for video in (post.videos_url or [])]),
+            json.dumps([image.model_dump() for image in (post.images_url or [])]),
+            json.dumps([link.model_dump() for link in (post.links_url or [])]),
+            post.snapshot_id,
+            post.content_hash(),
+        )
+
+    def stage_chunk(self, cursor, chunk: list[SocialPostScheme]) -> None:
+        """Stage one chunk with COPY or multi-row INSERTs. Duplicate URLs keep the first."""
+        if self.should_copy(len(chunk)):
+            self.copy_chunk(cursor, chunk)
+        else:
+            self.insert_chunk(cursor, chunk)
+        self.staged += len(chunk)
+
+    def should_copy(self, chunk_size: int) -> bool:
+        if self.use_copy is not None:
+            return self.use_copy
+        return self.staged + chunk_size - self.existing >= settings.SOCIAL_POSTS_COPY_THRESHOLD
+
+    def insert_chunk(self, cursor, chunk: list[SocialPostScheme]) -> None:
+        placeholders = "(" + ", ".join(["%s"] * len(self.STAGING_COLUMNS)) + ")"
+        for batch_start_index in range(0, len(chunk), settings.BATCH_SIZE):
+            batch = chunk[batch_start_index:batch_start_index + settings.BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {self.STAGING_TABLE} ({', '.join(self.STAGING_COLUMNS)}) "
+                f"VALUES {', '.join([placeholders] * len(batch))} ON CONFLICT (external_url) DO NOTHING",
+                [value for post in batch for value in self.staging_row(post)],
+            )
+
+    def copy_chunk(self, cursor, chunk: list[SocialPostScheme]) -> None:
+        """Buffer a chunk as CSV and COPY the buffer once it holds `COPY_BATCH_SIZE` rows."""
+        if self.copy_buffer is None:
+            self.copy_buffer = io.StringIO()
+            # Unquoted empty fields are NULL in CSV COPY, quoted empty strings stay empty strings.
+            self.copy_writer = csv.writer(self.copy_buffer, quoting=csv.QUOTE_NOTNULL)
+        self.copy_writer.writerows(self.staging_row(post) for post in chunk)
+        self.copy_rows += len(chunk)
+        if self.copy_rows >= self.COPY_BATCH_SIZE:
+            self.flush_copy(cursor)
+
+    def flush_copy(self, cursor) -> None:
+        """COPY buffered rows into a second temporary table, then move them into the staging table:
+        COPY cannot skip conflicts, and URLs may repeat across chunks."""
+        if not self.copy_rows:
+            return
+        cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {self.STAGING_TABLE}_copy "
+                       f"(LIKE {self.STAGING_TABLE}) ON COMMIT DELETE ROWS")
+        cursor.execute(f"TRUNCATE {self.STAGING_TABLE}_copy")
+
+        self.copy_buffer.seek(0)
+        copy_sql = f"COPY {self.STAGING_TABLE}_copy ({', '.join(self.STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(copy_sql, self.copy_buffer)
+        else:  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(self.copy_buffer.getvalue())
+        cursor.execute(
+            f"INSERT INTO {self.STAGING_TABLE} SELECT * FROM {self.STAGING_TABLE}_copy "
+            f"ON CONFLICT (external_url) DO NOTHING"
+        )
+
+        self.copy_buffer.seek(0)
+        self.copy_buffer.truncate()
+        self.copy_rows = 0
+
+    def merge(self, cursor) -> SocialPostSyncResult:
+        """Upsert new and changed staged posts and delete posts that are not staged."""
+        columns = ", ".join(self.STAGING_COLUMNS)
+        update_columns = ["post_type"] + [column for column in self.STAGING_COLUMNS if column != "external_url"]
+        now = timezone.now()
+
+        cursor.execute(f"SELECT count(*) FROM {self.STAGING_TABLE}")
+        staged = cursor.fetchone()[0]
+
+        # `xmax = 0` is true only for freshly inserted rows, so RETURNING tells inserts from updates.
+        cursor.execute(
+            f"""
+            WITH upserted AS (
+                INSERT INTO {self.table} (user_id, platform, post_type, {columns}, created_at, updated_at)
+                SELECT %s, %s, %s, {columns}, %s, %s FROM {self.STAGING_TABLE}
+                ON CONFLICT (user_id, platform, external_url) DO UPDATE SET
+                    {", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)},
+                    updated_at = EXCLUDED.updated_at
+                WHERE {self.table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                  AND NOT (EXCLUDED.snapshot_id IS NOT NULL
+                           AND {self.table}.snapshot_id IS NOT DISTINCT FROM EXCLUDED.snapshot_id)
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+            """,
+            [self.user.pk, self.platform, self.post_type, now, now],
+        )
+        created, updated = cursor.fetchone()
+
+        cursor.execute(
+            f"""
+            DELETE FROM {self.table} AS post
+            WHERE post.user_id = %s AND post.platform = %s AND post.post_type = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM {self.STAGING_TABLE} AS staged WHERE staged.external_url = post.external_url
+              )
+            """,
+            [self.user.pk, self.platform, self.post_type],
+        )
+        deleted = cursor.rowcount
+
+        return SocialPostSyncResult(created=created, updated=updated, unchanged=staged - created - updated,
+                                    deleted=deleted)
+
+    def reconcile(self, chunks: Iterable[list[SocialPostScheme]]) -> SocialPostSyncResult:
+        """Stage every chunk, then merge the staging table into the posts table."""
+        with connection.cursor() as cursor:
+            self.create_staging_table(cursor)
+            if self.use_copy is None:
+                self.existing = self.model.objects.filter(
+                    user=self.user, platform=self.platform, post_type=self.post_type
+                ).count()
+            for chunk in chunks:
+                self.stage_chunk(cursor, chunk)
+            self.flush_copy(cursor)
+            return self.merge(cursor)
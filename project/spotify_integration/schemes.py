@@ -1,3 +1,4 @@
+import hashlib
 from datetime import datetime
 
 from pydantic import BaseModel, Field
@@ -57,6 +58,34 @@ class SocialPostScheme(BaseModel):
     posted_at: datetime | None = None  # Date of event
     title: str | None = None  # Title (different for different events) (optional)
     text: str | None = None  # Text (different for different events) (optional)
-    videos_url: list[SocialVideo] = None
+    videos_url: list[SocialVideo] | None = None
     images_url: list[Image] | None = None
     links_url: list[SocialLink] | None = None
+    snapshot_id: str | None = None  # Version of the entity, changes only when the entity changes (optional)
+
+    def content_hash(self) -> str:
+        """Fingerprint of the post content, used to detect changed posts."""
+        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+
+
+class SocialPostSyncResult(BaseModel):
+    created: int = 0  # New posts inserted
+    updated: int = 0  # Existing posts rewritten because the entity changed
+    unchanged: int = 0  # Existing posts left untouched
+    deleted: int = 0  # Posts removed because they are gone on the platform
+    duration: float = 0.0  # Seconds spent fetching and writing the collection
+    write_duration: float = 0.0  # Seconds of `duration` spent writing to the database
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.created or self.updated or self.deleted)
+
+
+class SocialPostBatch(BaseModel):
+    """Fetched and mapped posts of one collection, handed from the fetch stage to the write stage."""
+    post_type: str
+    posts: list[SocialPostScheme]
+    append_only: bool = False  # Posts are only the new ones: insert them and keep the existing posts
+    last_posted_at: datetime | None = None  # High-water mark to store in the sync state (tracks)
+    total_count: int | None = None  # Number of items on the platform to store in the sync state (tracks)
+    fetch_duration: float = 0.0  # Seconds spent fetching and mapping
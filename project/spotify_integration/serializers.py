@@ -1,5 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
+from spotify_integration.models import SocialPost
+
 
 class SpotifyAuthSerializer(serializers.Serializer):
     """Serializer for handling Spotify authentication data."""
@@ -30,3 +33,32 @@ class SpotifyCallbackSerializer(serializers.Serializer):
     error = serializers.CharField(
         required=False, allow_blank=True, help_text="Error message"
     )
+
+
+class SocialFeedQuerySerializer(serializers.Serializer):
+    """Serializer for validating feed query parameters."""
+
+    class Meta:
+        fields = ['post_type', 'cursor', 'page_size']
+
+    post_type = serializers.ChoiceField(
+        choices=SocialPost.POST_TYPE_CHOICES, help_text="Type of posts to list"
+    )
+    cursor = serializers.CharField(
+        required=False, help_text="Cursor of the page, from `next_cursor` of the previous page"
+    )
+    page_size = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.SOCIAL_FEED_MAX_PAGE_SIZE,
+        default=settings.REST_FRAMEWORK['PAGE_SIZE'], help_text="Number of posts per page"
+    )
+
+
+class SocialPostSerializer(serializers.ModelSerializer):
+    """Serializer for social posts in the feed."""
+
+    class Meta:
+        model = SocialPost
+        fields = [
+            'id', 'platform', 'post_type', 'external_id', 'external_url', 'external_username', 'external_user_url',
+            'posted_at', 'title', 'text', 'videos_url', 'images_url', 'links_url',
+        ]
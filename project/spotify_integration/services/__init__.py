@@ -1,11 +1,38 @@
+from .async_spotify_client import AsyncSpotifyApiClient
+from .async_spotify_data_service import AsyncSpotifyDataService
+from .feed_cache import SocialFeedCache
+from .rate_limiter import SpotifyRateLimiter
+from .social_feed_service import SocialFeedService
 from .spotify_auth_service import SpotifyAuthService
+from .spotify_client import SpotifyApiClient, get_spotify_client
 from .spotify_data_service import SpotifyDataService
 from .spotify_service import SpotifyService
 from .storage_service import StateStorageService
+from .sync_job_service import SyncJobService
+from .sync_lease import SyncLeaseService
+from .sync_payload_store import SyncPayloadStore
+from .sync_scheduler import SpotifySyncScheduler
+from .token_cache import AccessTokenCache, get_access_token_cache
+from .token_refresh_service import SpotifyTokenRefreshService, get_token_refresh_service
 
 __all__ = [
     "SpotifyService",
     "SpotifyAuthService",
     "StateStorageService",
     "SpotifyDataService",
+    "SpotifyApiClient",
+    "get_spotify_client",
+    "SpotifyRateLimiter",
+    "AsyncSpotifyApiClient",
+    "AsyncSpotifyDataService",
+    "AccessTokenCache",
+    "get_access_token_cache",
+    "SpotifyTokenRefreshService",
+    "get_token_refresh_service",
+    "SpotifySyncScheduler",
+    "SyncLeaseService",
+    "SyncPayloadStore",
+    "SyncJobService",
+    "SocialFeedService",
+    "SocialFeedCache",
 ]
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+
+import httpx
+from django.conf import settings
+
+from spotify_integration.services.rate_limiter import SpotifyRateLimiter
+from spotify_integration.services.spotify_client import SpotifyApiClient
+from spotify_integration.services.spotify_service import SpotifyApiError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSpotifyApiClient:
+    """
+    Asyncio HTTP client for the Spotify Web API.
+
+    A single `httpx.AsyncClient` keeps connections alive for every coroutine on the event loop.
+    A semaphore bounds the number of requests in flight; requests share the cluster-wide rate limiter
+    with the synchronous client. Use it as an async context manager.
+    """
+
+    def __init__(self, max_concurrency: int | None = None, rate_limiter: SpotifyRateLimiter | None = None):
+        self.max_concurrency = max_concurrency or settings.SPOTIFY_ASYNC_MAX_CONCURRENCY
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.rate_limiter = rate_limiter or SpotifyRateLimiter()
+        self.max_rate_limit_retries = settings.SPOTIFY_RATE_LIMIT_MAX_RETRIES
+        self.client = httpx.AsyncClient(
+            base_url=settings.SPOTIFY_API_URL,
+            timeout=httpx.Timeout(settings.SPOTIFY_HTTP_READ_TIMEOUT, connect=settings.SPOTIFY_HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            headers={"Accept": "application/json", "Accept-Encoding": "gzip, deflate"},
+        )
+
+    async def __aenter__(self) -> "AsyncSpotifyApiClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.client.aclose()
+
+    async def _acquire_rate_limit(self) -> None:
+        """Wait for a rate limiter token without blocking the event loop."""
+        waited = 0.0
+        while wait := await asyncio.to_thread(self.rate_limiter.try_acquire):
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            await asyncio.to_thread(self.rate_limiter.record_wait, waited)
+
+    async def get(self, path_or_url: str, access_token: str, params: dict | None = None) -> dict:
+        """Perform a GET request and return the decoded JSON body."""
+        retry_after = None
+        for _ in range(self.max_rate_limit_retries + 1):
+            await self._acquire_rate_limit()
+            async with self.semaphore:
+                try:
+                    response = await self.client.get(
+                        path_or_url if path_or_url.startswith("http") else path_or_url.lstrip("/"),
+                        headers={"Authorization": f"Bearer {access_token}"},
+                        params=params,
+                    )
+                except httpx.HTTPError as e:
+                    logger.error(f"Network error requesting {path_or_url}: {e}")
+                    raise SpotifyApiError(f"Network error requesting Spotify API: {e}") from e
+
+            if response.status_code != 429:
+                return SpotifyApiClient.decode_response(response)
+
+            retry_after = SpotifyApiClient.get_retry_after(response)
+            await asyncio.to_thread(self.rate_limiter.pause, retry_after)
+
+        raise SpotifyApiError(
+            f"Spotify API rate limit exceeded after {self.max_rate_limit_retries} retries.",
+            status_code=429,
+            retry_after=retry_after,
+        )
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from django.conf import settings
+
+from spotify_integration.services.async_spotify_client import AsyncSpotifyApiClient
+from spotify_integration.services.spotify_service import SpotifyApiError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSpotifyDataService:
+    """
+    Asyncio fetch backend for the Spotify library endpoints.
+
+    Returns the same raw items as `SpotifyDataService`, but runs the pagination of many users
+    concurrently on one event loop. Concurrency is bounded by the client's semaphore.
+    """
+
+    COLLECTIONS = ("tracks", "playlists", "following")
+
+    def __init__(self, client: AsyncSpotifyApiClient):
+        self.client = client
+
+    async def _fetch_paginated_page(self, url: str, access_token: str, limit: int, offset: int) -> dict:
+        return await self.client.get(url, access_token, params={"limit": limit, "offset": offset})
+
+    async def fetch_offset_paginated(self, url: str, access_token: str) -> list:
+        """Fetch all items of an offset-paginated endpoint: the first page, then the remaining pages concurrently.
+        Items keep the API order; an error on any page is propagated."""
+        limit = settings.DEFAULT_LIMIT
+        first_page_data = await self._fetch_paginated_page(url, access_token, limit, 0)
+        total_count = first_page_data.get("total", 0)
+        items = first_page_data.get("items", [])
+
+        pages = await asyncio.gather(*[
+            self._fetch_paginated_page(url, access_token, limit, offset)
+            for offset in range(limit, total_count, limit)
+        ])
+        for page_data in pages:
+            items.extend(page_data.get("items") or [])
+        return items
+
+    async def fetch_user_tracks(self, access_token: str) -> list:
+        """Fetch user's tracks: the first page, then the remaining pages concurrently."""
+        try:
+            return await self.fetch_offset_paginated("me/tracks", access_token)
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching user tracks: {e}")
+            raise SpotifyApiError("Failed to fetch user tracks from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
+
+    async def fetch_user_playlists(self, access_token: str) -> list:
+        """Fetch all user playlists: the first page, then the remaining pages concurrently."""
+        try:
+            return await self.fetch_offset_paginated("me/playlists", access_token)
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching user playlists: {e}")
+            raise SpotifyApiError("Failed to fetch user playlists from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
+
+    async def fetch_user_following(self, access_token: str) -> list:
+        """Fetch all artists followed by the user, following cursor `next` links."""
+        url = "me/following"
+        params = {"limit": settings.DEFAULT_LIMIT, "type": "artist"}
+
+        all_items = []
+
+        try:
+            while url:
+                data = await self.client.get(url, access_token, params=params)
+                artist_data = data.get("artists", {})
+                all_items.extend(artist_data.get("items", []))
+                url = artist_data.get("next")
+                params = None
+            return all_items
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching user following: {e}")
+            raise SpotifyApiError("Failed to fetch user following from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
+
+    async def fetch_user_data(self, access_token: str, collections: tuple[str, ...] = COLLECTIONS) -> dict:
+        """Fetch the given collections of one user concurrently.
+        A failed collection is returned as its exception so it does not cancel the others."""
+        fetchers = {
+            "tracks": self.fetch_user_tracks,
+            "playlists": self.fetch_user_playlists,
+            "following": self.fetch_user_following,
+        }
+        results = await asyncio.gather(
+            *[fetchers[collection](access_token) for collection in collections],
+            return_exceptions=True,
+        )
+        return dict(zip(collections, results))
+
+    async def fetch_users_data(self, access_tokens: dict[int, str], collections: tuple[str, ...] = COLLECTIONS) -> dict:
+        """Fetch collections for many users at once. `access_tokens` maps user ID to access token."""
+        results = await asyncio.gather(*[
+            self.fetch_user_data(access_token, collections) for access_token in access_tokens.values()
+        ])
+        return dict(zip(access_tokens.keys(), results))
+
+    @classmethod
+    def run(cls, access_tokens: dict[int, str], collections: tuple[str, ...] = COLLECTIONS) -> dict:
+        """Run `fetch_users_data` on a fresh event loop; entry point for synchronous callers like Celery tasks."""
+
+        async def _run() -> dict:
+            async with AsyncSpotifyApiClient() as client:
+                return await cls(client).fetch_users_data(access_tokens, collections)
+
+        return asyncio.run(_run())
@@ -0,0 +1,87 @@
+import logging
+import secrets
+
+import orjson
+from django.conf import settings
+from redis import Redis, RedisError
+
+from spotify_integration.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class SocialFeedCache:
+    """
+    Redis cache of rendered feed pages, invalidated by versioning instead of purging.
+
+    Every (user, platform, post_type) has a random version token, and cached pages are keyed on it.
+    `SocialPost` writes bump the version after their transaction commits, and only if rows actually
+    changed, so a page is never served after a sync changed it, and the pages stay cached between syncs.
+    Pages of old versions are never read again and expire after `SOCIAL_FEED_CACHE_TTL` seconds.
+    Errors fail open: the feed is read from the database.
+    """
+
+    def __init__(self, redis_client: Redis | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.ttl = settings.SOCIAL_FEED_CACHE_TTL
+        self.prefix = "spotify:feed"
+        self.stats_key = f"{self.prefix}:stats"
+
+    def _version_key(self, user_id: int, platform: str, post_type: str) -> str:
+        return f"{self.prefix}:version:{user_id}:{platform}:{post_type}"
+
+    def _page_key(self, user_id: int, platform: str, post_type: str, version: str, page_size: int,
+                  cursor: str | None) -> str:
+        return f"{self.prefix}:page:{user_id}:{platform}:{post_type}:{version}:{page_size}:{cursor or ''}"
+
+    def get_version(self, user_id: int, platform: str, post_type: str) -> str | None:
+        """Return the current version of a feed, starting a new one if there is none.
+        Random versions never repeat, so a lost version key cannot revive pages cached under an old one."""
+        key = self._version_key(user_id, platform, post_type)
+        try:
+            self.redis_client.set(key, secrets.token_hex(8), nx=True)
+            version = self.redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Feed cache unavailable for user {user_id}: {e}")
+            return None
+        return version.decode() if version else None
+
+    def bump(self, user_id: int, platform: str, post_type: str) -> None:
+        """Start a new version of a feed, so pages cached under the previous one are no longer served."""
+        try:
+            self.redis_client.set(self._version_key(user_id, platform, post_type), secrets.token_hex(8))
+        except RedisError as e:
+            logger.warning(f"Feed cache version of user {user_id} {post_type} not bumped: {e}")
+
+    def get_page(self, user_id: int, platform: str, post_type: str, version: str, page_size: int,
+                 cursor: str | None) -> dict | None:
+        """Return a cached page and count the hit or miss."""
+        try:
+            page = self.redis_client.get(self._page_key(user_id, platform, post_type, version, page_size, cursor))
+            self.redis_client.hincrby(self.stats_key, "hits" if page is not None else "misses", 1)
+        except RedisError as e:
+            logger.warning(f"Feed cache unavailable for user {user_id}: {e}")
+            return None
+        return orjson.loads(page) if page is not None else None
+
+    def set_page(self, user_id: int, platform: str, post_type: str, version: str, page_size: int,
+                 cursor: str | None, page: dict) -> None:
+        try:
+            self.redis_client.set(
+                self._page_key(user_id, platform, post_type, version, page_size, cursor),
+                orjson.dumps(page),
+                ex=self.ttl,
+            )
+        except RedisError as e:
+            logger.warning(f"Feed cache unavailable for user {user_id}: {e}")
+
+    def get_stats(self) -> dict:
+        """Return cluster-wide cache counters and the hit ratio."""
+        raw = self.redis_client.hgetall(self.stats_key)
+        stats = {key.decode(): int(value) for key, value in raw.items()}
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
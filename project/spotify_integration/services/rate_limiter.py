@@ -0,0 +1,112 @@
+import logging
+import math
+import time
+
+from django.conf import settings
+from redis import Redis, RedisError
+
+from spotify_integration.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Token bucket shared by every worker. Uses the Redis server clock so all hosts agree on time.
+# Returns the number of milliseconds the caller has to wait (0 means a token was taken).
+TOKEN_BUCKET_SCRIPT = """
+local bucket_key = KEYS[1]
+local pause_key = KEYS[2]
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+
+local pause_ms = redis.call('PTTL', pause_key)
+if pause_ms > 0 then
+    return pause_ms
+end
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call('HMGET', bucket_key, 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) / rate * 1000)
+end
+
+redis.call('HSET', bucket_key, 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', bucket_key, math.ceil(burst / rate * 1000) + 1000)
+return wait_ms
+"""
+
+
+class SpotifyRateLimiter:
+    """Cluster-wide token bucket for Spotify API requests, backed by Redis."""
+
+    def __init__(self, redis_client: Redis | None = None, rate: float | None = None, burst: int | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.rate = rate or settings.SPOTIFY_RATE_LIMIT_RATE
+        self.burst = burst or settings.SPOTIFY_RATE_LIMIT_BURST
+        self.enabled = settings.SPOTIFY_RATE_LIMIT_ENABLED
+        self.prefix = "spotify:rate_limit"
+        self.bucket_key = f"{self.prefix}:bucket"
+        self.pause_key = f"{self.prefix}:pause"
+        self.stats_key = f"{self.prefix}:stats"
+        self._script = self.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def try_acquire(self) -> float:
+        """Try to take a token without blocking. Return 0 on success or the seconds to wait before retrying."""
+        if not self.enabled:
+            return 0.0
+        try:
+            wait_ms = int(self._script(keys=[self.bucket_key, self.pause_key], args=[self.rate, self.burst]))
+        except RedisError as e:
+            # Fail open: an unavailable limiter must not stop synchronization.
+            logger.warning(f"Spotify rate limiter unavailable: {e}")
+            return 0.0
+        return max(0, wait_ms) / 1000
+
+    def acquire(self) -> float:
+        """Block until a request token is available. Return the number of seconds spent waiting."""
+        waited = 0.0
+        while wait := self.try_acquire():
+            time.sleep(wait)
+            waited += wait
+
+        if waited:
+            self.record_wait(waited)
+        return waited
+
+    def pause(self, retry_after: float) -> None:
+        """Pause all callers for `retry_after` seconds, e.g. after a 429 response."""
+        pause_ms = max(1, math.ceil(retry_after * 1000))
+        try:
+            if not self.redis_client.set(self.pause_key, 1, px=pause_ms, nx=True):
+                self.redis_client.pexpire(self.pause_key, pause_ms, gt=True)
+            self.redis_client.hincrby(self.stats_key, "throttled", 1)
+        except RedisError as e:
+            logger.warning(f"Spotify rate limiter unavailable, sleeping locally: {e}")
+            time.sleep(retry_after)
+        logger.warning(f"Spotify rate limit hit, pausing requests for {retry_after}s.")
+
+    def record_wait(self, seconds: float) -> None:
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.hincrbyfloat(self.stats_key, "wait_seconds", seconds)
+            pipe.hincrby(self.stats_key, "waits", 1)
+            pipe.execute()
+        except RedisError:
+            pass
+
+    def get_stats(self) -> dict:
+        """Return cluster-wide limiter counters: total wait seconds, number of waits and 429 responses."""
+        raw = self.redis_client.hgetall(self.stats_key)
+        stats = {key.decode(): float(value) for key, value in raw.items()}
+        return {
+            "wait_seconds": stats.get("wait_seconds", 0.0),
+            "waits": int(stats.get("waits", 0)),
+            "throttled": int(stats.get("throttled", 0)),
+        }
@@ -0,0 +1,10 @@
+from functools import lru_cache
+
+from django.conf import settings
+from redis import Redis
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> Redis:
+    """Return a process-wide Redis client; its connection pool is fork-safe and thread-safe."""
+    return Redis.from_url(settings.REDIS_URL)
@@ -0,0 +1,64 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db.models import F, Q, QuerySet
+
+from spotify_integration.models import SocialPost
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a feed cursor cannot be decoded."""
+
+
+class SocialFeedService:
+    """
+    Keyset (cursor) pagination of a user's social posts, newest first.
+
+    Posts are ordered by `posted_at` descending with posts without a date (playlists, followed artists) first,
+    then by `id` descending. A cursor encodes the (posted_at, id) of the last post of a page, and the next page
+    continues strictly after it, so every page is a range scan of the `social_posts_feed` index
+    however deep it is, and posts inserted by a sync do not shift the following pages.
+    """
+
+    ORDERING = (F("posted_at").desc(nulls_first=True), F("id").desc())
+
+    @staticmethod
+    def encode_cursor(post: SocialPost) -> str:
+        position = [post.posted_at.isoformat() if post.posted_at else None, post.pk]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime | None, int]:
+        try:
+            posted_at, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return (datetime.fromisoformat(posted_at) if posted_at else None), int(post_id)
+        except (binascii.Error, ValueError, TypeError) as e:
+            raise InvalidCursorError(f"Invalid feed cursor: {cursor}") from e
+
+    def get_queryset(self, user: User, platform: str, post_type: str) -> QuerySet:
+        return SocialPost.objects.filter(user=user, platform=platform, post_type=post_type).order_by(*self.ORDERING)
+
+    def get_page(self,
+                 user: User,
+                 platform: str,
+                 post_type: str,
+                 page_size: int,
+                 cursor: str | None = None,
+                 ) -> tuple[list[SocialPost], str | None]:
+        """Return a page of posts and the cursor of the next page, or None if it is the last page."""
+        posts = self.get_queryset(user, platform, post_type)
+        if cursor:
+            posted_at, post_id = self.decode_cursor(cursor)
+            if posted_at is None:
+                posts = posts.filter(Q(posted_at__isnull=True, id__lt=post_id) | Q(posted_at__isnull=False))
+            else:
+                # `posted_at <= cursor` bounds the index range; the OR only breaks ties on the same date.
+                posts = posts.filter(Q(posted_at__lte=posted_at), Q(posted_at__lt=posted_at) | Q(id__lt=post_id))
+
+        page = list(posts[:page_size + 1])
+        if len(page) <= page_size:
+            return page, None
+        return page[:page_size], self.encode_cursor(page[page_size - 1])
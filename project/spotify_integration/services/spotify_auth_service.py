@@ -1,12 +1,17 @@
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 import spotipy
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
+from redis import RedisError
+from redis.exceptions import LockError
 
 from spotify_integration.models import SocialCredential
 from spotify_integration.schemes import SpotifyProfile, TokenInfo
+from spotify_integration.services.token_cache import get_access_token_cache
+from spotify_integration.services.token_refresh_service import get_token_refresh_lock, get_token_refresh_service
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +53,7 @@ class SpotifyAuthService:
 
         credentials.expires_at = expires_at
         credentials.save()
+        get_access_token_cache().invalidate(user.pk)
         logger.info(f"{'Created' if created else 'Updated'} Spotify credentials for user: {user.username}")
         return credentials
 
@@ -70,10 +76,60 @@ class SpotifyAuthService:
         logger.info(f"Created new user: {user.username} from Spotify profile.")
         return user
 
-    @staticmethod
-    def get_access_token(user: User) -> str:
-        """Get the access token for the user."""
-        token = SocialCredential.objects.get_access_token(user)
-        if token is None:
-            raise ValueError("Spotify credentials are missing or expired.")
+    @classmethod
+    def get_access_token(cls, user: User) -> str:
+        """Get the access token for the user, from the access token cache when possible.
+        An expired token is refreshed on read."""
+        token_cache = get_access_token_cache()
+        token = token_cache.get(user.pk)
+        if token is not None:
+            return token
+
+        token_with_expiry = SocialCredential.objects.get_access_token_with_expiry(user)
+        if token_with_expiry is None:
+            token_with_expiry = cls.refresh_expired_access_token(user)
+        token, expires_at = token_with_expiry
+        token_cache.set(user.pk, token, expires_at)
         return token
+
+    @classmethod
+    def refresh_expired_access_token(cls, user: User) -> tuple[str, datetime]:
+        """
+        Refresh an expired access token behind a per-user Redis lock.
+        Concurrent callers wait for the lock holder and reuse the token it stored instead of refreshing again.
+        If Redis is unavailable, the token is refreshed without the lock.
+        """
+        lock = get_token_refresh_lock(user.pk, blocking_timeout=settings.SPOTIFY_TOKEN_REFRESH_LOCK_TIMEOUT)
+        try:
+            acquired = lock.acquire()
+        except RedisError as e:
+            logger.warning(f"Token refresh lock unavailable for user {user.pk}: {e}")
+            return cls._refresh_access_token(user)
+        if not acquired:
+            token_with_expiry = SocialCredential.objects.get_access_token_with_expiry(user)
+            if token_with_expiry is None:
+                raise ValueError("Spotify credentials are expired and the token refresh is still in progress.")
+            return token_with_expiry
+
+        try:
+            # Another caller may have refreshed the token while this one waited for the lock.
+            token_with_expiry = SocialCredential.objects.get_access_token_with_expiry(user)
+            if token_with_expiry is not None:
+                return token_with_expiry
+            return cls._refresh_access_token(user)
+        finally:
+            try:
+                lock.release()
+            except (LockError, RedisError):
+                pass
+
+    @classmethod
+    def _refresh_access_token(cls, user: User) -> tuple[str, datetime]:
+        credentials = SocialCredential.objects.filter(user=user, platform="spotify").first()
+        if credentials is None or not credentials.refresh_token:
+            raise ValueError("Spotify credentials are missing or expired.")
+
+        token_info = get_token_refresh_service().refresh_access_token(credentials.refresh_token_value)
+        credentials = cls.create_or_update_user_credentials(user, token_info)
+        logger.info(f"Refreshed expired Spotify access token for user: {user.username}")
+        return token_info.access_token, credentials.expires_at
@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+
+import orjson
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from spotify_integration.services.rate_limiter import SpotifyRateLimiter
+from spotify_integration.services.spotify_service import SpotifyApiError
+
+logger = logging.getLogger(__name__)
+
+
+class SpotifyApiClient:
+    """
+    HTTP client for the Spotify Web API.
+
+    Wraps a single keep-alive `requests.Session` with a sized connection pool, so pages fetched
+    from the same worker (including from a thread pool) reuse TCP/TLS connections to api.spotify.com.
+    Every request first takes a token from the cluster-wide rate limiter; 429 responses pause all
+    workers for the `Retry-After` duration and the request is retried.
+    """
+
+    def __init__(self,
+                 base_url: str | None = None,
+                 pool_size: int | None = None,
+                 rate_limiter: SpotifyRateLimiter | None = None):
+        self.base_url = (base_url or settings.SPOTIFY_API_URL).rstrip("/")
+        self.timeout = (settings.SPOTIFY_HTTP_CONNECT_TIMEOUT, settings.SPOTIFY_HTTP_READ_TIMEOUT)
+        self.session = self._build_session(pool_size or settings.SPOTIFY_HTTP_POOL_SIZE)
+        self.rate_limiter = rate_limiter or SpotifyRateLimiter()
+        self.max_rate_limit_retries = settings.SPOTIFY_RATE_LIMIT_MAX_RETRIES
+
+    @staticmethod
+    def _build_session(pool_size: int) -> requests.Session:
+        """Create a session with a bounded connection pool and transport-level retries for connect errors."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True,  # Wait for a free connection instead of opening throwaway ones
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+        )
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        return session
+
+    def build_url(self, path_or_url: str) -> str:
+        """Return an absolute API URL; Spotify `next` links are already absolute."""
+        if path_or_url.startswith("http"):
+            return path_or_url
+        return f"{self.base_url}/{path_or_url.lstrip('/')}"
+
+    def get(self, path_or_url: str, access_token: str, params: dict | None = None) -> dict:
+        """Perform a GET request and return the decoded JSON body."""
+        url = self.build_url(path_or_url)
+        for _ in range(self.max_rate_limit_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(
+                    url,
+                    headers={"Authorization": f"Bearer {access_token}"},
+                    params=params,
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                logger.error(f"Network error requesting {url}: {e}")
+                raise SpotifyApiError(f"Network error requesting Spotify API: {e}") from e
+
+            if response.status_code != 429:
+                return self.decode_response(response)
+
+            retry_after = self.get_retry_after(response)
+            self.rate_limiter.pause(retry_after)
+
+        raise SpotifyApiError(
+            f"Spotify API rate limit exceeded after {self.max_rate_limit_retries} retries.",
+            status_code=429,
+            retry_after=retry_after,
+        )
+
+    @staticmethod
+    def get_retry_after(response: requests.Response) -> float:
+        """Return the `Retry-After` header value in seconds, defaulting to one second."""
+        try:
+            return max(1.0, float(response.headers.get("Retry-After", 1)))
+        except ValueError:
+            return 1.0
+
+    @staticmethod
+    def decode_response(response: requests.Response) -> dict:
+        """Decode a Spotify API response with orjson, raising `SpotifyApiError` for non-200 statuses.
+        Works for both `requests` and `httpx` responses."""
+        try:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            data = {}
+
+        if response.status_code != 200:
+            error_data = data.get("error", {}) if isinstance(data, dict) else {}
+            if not isinstance(error_data, dict):
+                error_data = {"message": str(error_data)}
+            error_message = error_data.get("message", "Unknown error")
+            error_status = error_data.get("status", response.status_code)
+            logger.error(f"Spotify API error: {error_status} - {error_message}")
+            raise SpotifyApiError(
+                f"Spotify API error: {error_message} (status: {error_status})",
+                status_code=response.status_code,
+            )
+        return data
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: SpotifyApiClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_spotify_client() -> SpotifyApiClient:
+    """Return the process-wide Spotify API client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SpotifyApiClient()
+    return _client
+
+
+def _reset_client_after_fork() -> None:
+    """Prefork workers must not share sockets with the parent process."""
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client_after_fork)
@@ -1,12 +1,19 @@
 import logging
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
 from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
 
-import requests
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
 
-from spotify_integration.models import SocialPost
-from spotify_integration.schemes import SocialPostScheme
+from spotify_integration.models import SocialPost, SocialSyncState
+from spotify_integration.schemes import SocialPostBatch, SocialPostScheme, SocialPostSyncResult
+from spotify_integration.services.spotify_client import SpotifyApiClient, get_spotify_client
 from spotify_integration.services.spotify_service import SpotifyApiError
 
 logger = logging.getLogger(__name__)
@@ -15,119 +22,121 @@ logger = logging.getLogger(__name__)
 class SpotifyDataService:
     """Service to fetch data from Spotify API."""
 
-    @staticmethod
-    def _fetch_paginated_page(url: str, headers: dict, limit: int, offset: int) -> dict:
-        response = requests.get(url,
-                                headers=headers,
-                                params={
-                                    "limit": limit,
-                                    "offset": offset
-                                })
-        return response.json()
+    COLLECTIONS = ("tracks", "playlists", "following")
+
+    def __init__(self, client: SpotifyApiClient | None = None, on_page: Callable[[], None] | None = None):
+        self.client = client or get_spotify_client()
+        self.on_page = on_page  # Called after every fetched page, e.g. to report job progress
+
+    def _get_page(self, url: str, access_token: str, params: dict | None = None) -> dict:
+        data = self.client.get(url, access_token, params=params)
+        if self.on_page:
+            self.on_page()
+        return data
+
+    def _fetch_paginated_page(self, url: str, access_token: str, limit: int, offset: int) -> dict:
+        return self._get_page(url, access_token, params={"limit": limit, "offset": offset})
+
+    def iter_offset_paginated(self, url: str, access_token: str) -> Iterator[list]:
+        """Yield the pages of an offset-paginated endpoint (`/me/tracks`, `/me/playlists`, ...) in API order.
+        Fetch the first page to learn `total`, then the remaining pages in parallel threads.
+        At most `SPOTIFY_MAX_PAGES_IN_FLIGHT` pages are requested ahead of the consumer,
+        so memory stays bounded however large the library is. An error on any page is propagated."""
+        limit = settings.DEFAULT_LIMIT
+        first_page_data = self._fetch_paginated_page(url, access_token, limit, 0)
+        yield first_page_data.get("items", [])
+
+        offsets = iter(range(limit, first_page_data.get("total", 0), limit))
+        with ThreadPoolExecutor(max_workers=settings.MAX_THREADS) as executor:
+            in_flight = deque(
+                executor.submit(self._fetch_paginated_page, url, access_token, limit, offset)
+                for offset in islice(offsets, settings.SPOTIFY_MAX_PAGES_IN_FLIGHT)
+            )
+            while in_flight:
+                page_data = in_flight.popleft().result()
+                if (offset := next(offsets, None)) is not None:
+                    in_flight.append(executor.submit(self._fetch_paginated_page, url, access_token, limit, offset))
+                yield page_data.get("items") or []
+
+    def fetch_offset_paginated(self, url: str, access_token: str) -> list:
+        """Fetch all items of an offset-paginated endpoint. Items keep the API order."""
+        return [item for page in self.iter_offset_paginated(url, access_token) for item in page]
 
     def fetch_user_tracks(self, access_token: str) -> list:
         """Fetch user's tracks from Spotify.
         Try to fetch first page and remaining pages in async mode if user has more than one page data."""
-        limit = settings.DEFAULT_LIMIT
-        workers = settings.MAX_THREADS
-        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-        url = "https://api.spotify.com/v1/me/tracks"
-
         try:
-            first_response = requests.get(url, headers=headers, params={"limit": limit, "offset": 0})
-            first_page_data = first_response.json()
-            if first_response.status_code != 200:
-                error_data = first_page_data.get('error', {})
-                error_message = error_data.get('message', 'Unknown error')
-                error_status = error_data.get('status', first_response.status_code)
-                logger.error(f"Spotify API error: {error_status} - {error_message}")
-                raise SpotifyApiError(f"Spotify API error: {error_message} (status: {error_status})")
-                logger.error(
-                    f"Error fetching user tracks: {first_page_data.get('error', {})
-                    .get('message', 'Unknown error')}",
-                    exc_info=True)
-                raise SpotifyApiError("Failed to fetch user tracks from Spotify.")
-
-            total_count = first_page_data.get("total", 0)
-            tracks = first_page_data.get("items", [])
-
-            if total_count > limit:
-                with ThreadPoolExecutor(max_workers=workers) as executor:
-                    futures = [executor.submit(
-                        self._fetch_paginated_page, url, headers, limit, offset
-                    ) for offset in range(limit, total_count, limit)]
-                    for future in futures:
-                        logger.info("started fetching page")
-                        page_data = future.result()
-                        if page_data.get("items"):
-                            tracks.extend(page_data["items"])
-            return tracks
-        except requests.RequestException as e:
+            return self.fetch_offset_paginated("me/tracks", access_token)
+        except SpotifyApiError as e:
             logger.error(f"Error fetching user tracks: {e}")
-            raise SpotifyApiError("Failed to fetch user tracks from Spotify.")
+            raise SpotifyApiError("Failed to fetch user tracks from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
 
-    def fetch_user_playlists(self, access_token: str) -> list:
-        """Fetch all user playlists from Spotify, handling pagination."""
+    def fetch_new_user_tracks(self, access_token: str, since: datetime) -> tuple[list, int]:
+        """Fetch tracks added after `since`. `/me/tracks` returns the newest items first,
+        so pages are fetched one by one until the first already known item.
+        Return the new items and the current number of tracks in the library."""
         limit = settings.DEFAULT_LIMIT
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        url = "https://api.spotify.com/v1/me/playlists"
-        params = {"limit": limit, "offset": 0}
-
-        all_items = []
+        offset = 0
+        new_tracks = []
 
         try:
-            while url:
-                response = requests.get(url, headers=headers, params=params)
-                if response.status_code != 200:
-                    error_msg = response.json().get("error", {}).get("message", "Unknown error")
-                    logger.error(f"Error fetching user playlists: {error_msg}")
-                    raise SpotifyApiError("Failed to fetch user playlists from Spotify.")
-
-                data = response.json()
-                all_items.extend(data.get("items", []))
-                url = data.get("next")  # Spotify provides full URL for the next page
-                params = None  # Clear params since `url` includes them now
+            while True:
+                page_data = self._fetch_paginated_page("me/tracks", access_token, limit, offset)
+                total_count = page_data.get("total", 0)
+                items = page_data.get("items") or []
+                for item in items:
+                    if parse_datetime(item["added_at"]) <= since:
+                        return new_tracks, total_count
+                    new_tracks.append(item)
+
+                offset += limit
+                if not items or offset >= total_count:
+                    return new_tracks, total_count
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching new user tracks: {e}")
+            raise SpotifyApiError("Failed to fetch user tracks from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
 
-            return all_items
-
-        except requests.RequestException as e:
-            logger.error(f"Network error fetching user playlists: {e}")
-            raise SpotifyApiError("Failed to fetch user playlists from Spotify.")
+    def fetch_user_playlists(self, access_token: str) -> list:
+        """Fetch all user playlists from Spotify, fetching pages after the first one in parallel."""
+        try:
+            return self.fetch_offset_paginated("me/playlists", access_token)
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching user playlists: {e}")
+            raise SpotifyApiError("Failed to fetch user playlists from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
+
+    def iter_user_following(self, access_token: str) -> Iterator[list]:
+        """Yield pages of artists followed by the user, following cursor `next` links."""
+        url = "me/following"
+        params = {"limit": settings.DEFAULT_LIMIT, "type": "artist"}
+
+        while url:
+            data = self._get_page(url, access_token, params=params)
+            artist_data = data.get("artists", {})
+            yield artist_data.get("items", [])
+            url = artist_data.get("next")
+            params = None  # Clear params after first request
 
     def fetch_user_following(self, access_token: str) -> list:
         """Fetch all artists followed by the user on Spotify, handling pagination."""
-        limit = settings.DEFAULT_LIMIT
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        url = "https://api.spotify.com/v1/me/following"
-        params = {"limit": limit, "type": "artist"}
-
-        all_items = []
-
         try:
-            while url:
-                response = requests.get(url, headers=headers, params=params if '?' not in url else None)
-                if response.status_code != 200:
-                    error_msg = response.json().get("error", {}).get("message", "Unknown error")
-                    logger.error(f"Error fetching user following: {error_msg}")
-                    raise SpotifyApiError("Failed to fetch user following from Spotify.")
-
-                data = response.json()
-                artist_data = data.get("artists", {})
-                all_items.extend(artist_data.get("items", []))
-                url = artist_data.get("next")
-                params = None  # Clear params after first request
-
-            return all_items
-
-        except requests.RequestException as e:
-            logger.error(f"Network error fetching user playlists: {e}")
-            raise SpotifyApiError("Failed to fetch user playlists from Spotify.")
+            return [artist for page in self.iter_user_following(access_token) for artist in page]
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching user following: {e}")
+            raise SpotifyApiError("Failed to fetch user following from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
+
+    def iter_user_collection(self, access_token: str, post_type: str) -> Iterator[list]:
+        """Yield the raw Spotify pages of one collection, unmapped."""
+        if post_type == "tracks":
+            return self.iter_offset_paginated("me/tracks", access_token)
+        if post_type == "playlists":
+            return self.iter_offset_paginated("me/playlists", access_token)
+        if post_type == "following":
+            return self.iter_user_following(access_token)
+        raise ValueError(f"Unknown Spotify collection: {post_type}")
 
     def map_tracks_to_social_posts(self, user: User, tracks: list) -> list[SocialPostScheme]:
         """Map Spotify tracks to social post data."""
@@ -187,7 +196,8 @@ class SpotifyDataService:
                 external_user_url=external_user_url,
                 posted_at=posted_at,
                 title=title,
-                images_url=images_url
+                images_url=images_url,
+                snapshot_id=playlist.get("snapshot_id"),
             ))
         return result
 
@@ -222,22 +232,229 @@ class SpotifyDataService:
             ))
         return result
 
+    def sync_user_tracks(self, user: User, access_token: str) -> SocialPostSyncResult:
+        """Synchronize user's saved tracks.
+
+        In incremental mode only the tracks added after the stored high-water mark are fetched and inserted.
+        If the library total does not match the known total plus the new tracks (something was removed),
+        or there is no stored state yet, fall back to a full fetch and reconciliation."""
+        state, _ = SocialSyncState.objects.get_or_create(user=user, platform="spotify", post_type="tracks")
+
+        if incremental := self.fetch_new_user_tracks_incrementally(user, access_token, state):
+            new_tracks, total_count = incremental
+            social_posts = self.map_tracks_to_social_posts(user, new_tracks)
+            started_at = time.monotonic()
+            if new_tracks:
+                SocialPost.add_social_posts(
+                    user=user, platform="spotify", post_type="tracks", social_posts=social_posts,
+                )
+                state.last_posted_at = parse_datetime(new_tracks[0]["added_at"])
+            state.total_count = total_count
+            state.save(update_fields=["last_posted_at", "total_count", "updated_at"])
+            logger.info(f"Incrementally synced {len(new_tracks)} new tracks for user {user.username}.")
+            return SocialPostSyncResult(created=len(new_tracks), unchanged=total_count - len(new_tracks),
+                                        write_duration=time.monotonic() - started_at)
+
+        state.last_posted_at = None
+        state.total_count = 0
+
+        def track_pages() -> Iterator[list]:
+            for page in self.iter_offset_paginated("me/tracks", access_token):
+                state.total_count += len(page)
+                added_at = [parse_datetime(track["added_at"]) for track in page]
+                if state.last_posted_at:
+                    added_at.append(state.last_posted_at)
+                state.last_posted_at = max(added_at, default=None)
+                yield page
+
+        result = self.sync_social_posts_stream(user, "tracks", track_pages(), self.map_tracks_to_social_posts)
+        state.save(update_fields=["last_posted_at", "total_count", "updated_at"])
+        return result
+
+    def fetch_new_user_tracks_incrementally(self,
+                                            user: User,
+                                            access_token: str,
+                                            state: SocialSyncState | None,
+                                            ) -> tuple[list, int] | None:
+        """Fetch the tracks added after the stored high-water mark and return them with the library total.
+        Return None if a full reconciliation is needed: incremental sync is off, there is no stored state,
+        or the total does not match the known total plus the new tracks (something was removed)."""
+        if not (settings.SPOTIFY_INCREMENTAL_SYNC and state and state.last_posted_at):
+            return None
+        new_tracks, total_count = self.fetch_new_user_tracks(access_token, state.last_posted_at)
+        if total_count != state.total_count + len(new_tracks):
+            logger.info(f"Spotify tracks total changed for user {user.username}, running full reconciliation.")
+            return None
+        return new_tracks, total_count
+
+    def fetch_user_collection(self, user: User, access_token: str, post_type: str) -> SocialPostBatch:
+        """Fetch and map one collection without writing it; the fetch stage of the split sync pipeline."""
+        started_at = time.monotonic()
+        if post_type == "tracks":
+            batch = self._fetch_user_tracks_batch(user, access_token)
+        elif post_type == "playlists":
+            batch = SocialPostBatch(post_type=post_type, posts=self.map_playlists_to_social_posts(
+                user, self.fetch_user_playlists(access_token)))
+        elif post_type == "following":
+            batch = SocialPostBatch(post_type=post_type, posts=self.map_following_artists_to_social_posts(
+                user, self.fetch_user_following(access_token)))
+        else:
+            raise ValueError(f"Unknown Spotify collection: {post_type}")
+        batch.fetch_duration = time.monotonic() - started_at
+        return batch
+
+    def _fetch_user_tracks_batch(self, user: User, access_token: str) -> SocialPostBatch:
+        state = SocialSyncState.objects.filter(user=user, platform="spotify", post_type="tracks").first()
+        if incremental := self.fetch_new_user_tracks_incrementally(user, access_token, state):
+            new_tracks, total_count = incremental
+            return SocialPostBatch(
+                post_type="tracks",
+                posts=self.map_tracks_to_social_posts(user, new_tracks),
+                append_only=True,
+                last_posted_at=parse_datetime(new_tracks[0]["added_at"]) if new_tracks else state.last_posted_at,
+                total_count=total_count,
+            )
+
+        tracks = self.fetch_user_tracks(access_token)
+        return SocialPostBatch(
+            post_type="tracks",
+            posts=self.map_tracks_to_social_posts(user, tracks),
+            last_posted_at=max((parse_datetime(track["added_at"]) for track in tracks), default=None),
+            total_count=len(tracks),
+        )
+
+    def write_user_collection(self, user: User, batch: SocialPostBatch) -> SocialPostSyncResult:
+        """Apply a fetched collection in one transaction; the write stage of the split sync pipeline."""
+        started_at = time.monotonic()
+        with transaction.atomic():
+            if batch.append_only:
+                SocialPost.add_social_posts(
+                    user=user, platform="spotify", post_type=batch.post_type, social_posts=batch.posts,
+                )
+                result = SocialPostSyncResult(created=len(batch.posts),
+                                              unchanged=(batch.total_count or 0) - len(batch.posts))
+            else:
+                result = self.bulk_update_social_posts(
+                    user=user, platform="spotify", post_type=batch.post_type, social_posts=batch.posts,
+                )
+            if batch.total_count is not None:
+                SocialSyncState.objects.update_or_create(
+                    user=user,
+                    platform="spotify",
+                    post_type=batch.post_type,
+                    defaults={"last_posted_at": batch.last_posted_at, "total_count": batch.total_count},
+                )
+        result.write_duration = time.monotonic() - started_at
+        result.duration = batch.fetch_duration + result.write_duration
+        return result
+
+    def sync_user_playlists(self, user: User, access_token: str) -> SocialPostSyncResult:
+        """Synchronize user's playlists page by page."""
+        return self.sync_social_posts_stream(
+            user, "playlists", self.iter_offset_paginated("me/playlists", access_token),
+            self.map_playlists_to_social_posts,
+        )
+
+    def sync_user_following(self, user: User, access_token: str) -> SocialPostSyncResult:
+        """Synchronize artists followed by the user page by page."""
+        return self.sync_social_posts_stream(
+            user, "following", self.iter_user_following(access_token), self.map_following_artists_to_social_posts,
+        )
+
+    def sync_user_library(self,
+                          user: User,
+                          access_token: str,
+                          collections: Iterable[str] = COLLECTIONS,
+                          ) -> dict[str, SocialPostSyncResult | Exception]:
+        """Synchronize several collections of one user concurrently, sharing the token and the HTTP session.
+        Each collection is written in its own transaction; its result carries the time it took.
+        A failed collection is returned as its exception so it does not stop the others."""
+        syncers = {
+            "tracks": self.sync_user_tracks,
+            "playlists": self.sync_user_playlists,
+            "following": self.sync_user_following,
+        }
+
+        def sync(collection: str) -> SocialPostSyncResult | Exception:
+            started_at = time.monotonic()
+            try:
+                with transaction.atomic():
+                    result = syncers[collection](user, access_token)
+            except Exception as e:
+                logger.error(f"Error syncing Spotify {collection} for user {user.username}: {e}", exc_info=True)
+                return e
+            finally:
+                connection.close()  # Each worker thread opens its own database connection
+            result.duration = time.monotonic() - started_at
+            return result
+
+        collections = list(collections)
+        with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+            return dict(zip(collections, executor.map(sync, collections)))
+
+    def sync_social_posts_stream(self,
+                                 user: User,
+                                 post_type: str,
+                                 pages: Iterable[list],
+                                 mapper: Callable[[User, list], list[SocialPostScheme]],
+                                 ) -> SocialPostSyncResult:
+        """Stream raw Spotify pages through mapping into the database, one page-sized chunk at a time.
+        Fetching and writing interleave, so the write time is the total minus the time spent producing chunks."""
+        fetch_duration = 0.0
+
+        def timed_chunks() -> Iterator[list[SocialPostScheme]]:
+            nonlocal fetch_duration
+            page_iterator = iter(pages)
+            while True:
+                started_at = time.monotonic()
+                page = next(page_iterator, None)
+                if page is None:
+                    return
+                chunk = mapper(user, page)
+                fetch_duration += time.monotonic() - started_at
+                yield chunk
+
+        started_at = time.monotonic()
+        try:
+            result = SocialPost.bulk_update_social_posts_stream(
+                user=user,
+                platform="spotify",
+                post_type=post_type,
+                chunks=timed_chunks(),
+            )
+        except SpotifyApiError as e:
+            logger.error(f"Error fetching user {post_type}: {e}")
+            raise SpotifyApiError(f"Failed to fetch user {post_type} from Spotify.",
+                                  status_code=e.status_code, retry_after=e.retry_after) from e
+        result.write_duration = time.monotonic() - started_at - fetch_duration
+        self._log_sync_result(user, post_type, result)
+        return result
+
     def bulk_update_social_posts(self,
                                  user: User,
                                  platform: str,
                                  post_type: str,
                                  social_posts: list[SocialPostScheme]
-                                 ) -> None:
+                                 ) -> SocialPostSyncResult:
         """Bulk update social posts in the database."""
 
-        if not social_posts:
-            SocialPost.objects.filter(platform=platform, post_type=post_type, user=user).delete()
-            return
-
-        SocialPost.bulk_update_social_posts(
+        started_at = time.monotonic()
+        result = SocialPost.bulk_update_social_posts(
             user=user,
             platform=platform,
             post_type=post_type,
             social_posts=social_posts
         )
-        logger.info(f"Bulk updated {len(social_posts)} social posts for user {user.username}.")
+        result.write_duration = time.monotonic() - started_at
+        self._log_sync_result(user, post_type, result)
+        return result
+
+    @staticmethod
+    def _log_sync_result(user: User, post_type: str, result: SocialPostSyncResult) -> None:
+        logger.info(
+            f"Bulk updated {post_type} social posts for user {user.username}: "
+            f"{result.created} created, {result.updated} updated, {result.unchanged} unchanged, "
+            f"{result.deleted} deleted."
+        )
+        if post_type == "playlists" and result.unchanged:
+            logger.info(f"Skipped {result.unchanged} playlists with unchanged snapshot for user {user.username}.")
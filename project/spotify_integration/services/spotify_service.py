@@ -10,7 +10,11 @@ logger = logging.getLogger(__name__)
 
 class SpotifyApiError(Exception):
     """Custom exception for Spotify API errors."""
-    pass
+
+    def __init__(self, message: str = "", status_code: int | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
 
 
 class SpotifyService:
@@ -0,0 +1,129 @@
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+from redis import Redis, RedisError
+
+from spotify_integration.schemes import SocialPostSyncResult
+from spotify_integration.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Apply (command, field, value) triplets to a job hash only while the job exists, so a job that expired
+# mid-sync is not recreated as a partial record. A positive ARGV[1] refreshes the job's expiry.
+UPDATE_JOB_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 3 do
+    redis.call(ARGV[i], KEYS[1], ARGV[i + 1], ARGV[i + 2])
+end
+if tonumber(ARGV[1]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class SyncJobService:
+    """
+    Lightweight records of sync jobs started from the API, kept in Redis for `SPOTIFY_SYNC_JOB_TTL` seconds.
+
+    A job moves from `queued` to `running` and ends as `succeeded`, `failed` or `skipped` (the collections
+    were already being synced); `retrying` marks a job waiting for a Celery retry. While it runs,
+    the job counts fetched Spotify pages and written rows. Progress updates fail open: a sync does not fail
+    because its job record could not be written.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, redis_client: Redis | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.prefix = "spotify:sync_job"
+        self.ttl = settings.SPOTIFY_SYNC_JOB_TTL
+        self._update_script = self.redis_client.register_script(UPDATE_JOB_SCRIPT)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    def _update(self, job_id: str, commands: list[tuple[str, str, object]], refresh_ttl: bool = False) -> None:
+        """Run HSET/HINCRBY `commands` on an existing job; a job that no longer exists is left alone."""
+        args = [self.ttl if refresh_ttl else 0]
+        for command in commands:
+            args.extend(command)
+        self._update_script(keys=[self._job_key(job_id)], args=args)
+
+    def create(self, user_id: int, collections: list[str]) -> str:
+        """Create a queued job and return its ID."""
+        job_id = uuid.uuid4().hex
+        now = timezone.now().isoformat()
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "user_id": user_id,
+            "collections": ",".join(collections),
+            "state": self.QUEUED,
+            "pages_fetched": 0,
+            "rows_written": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+        pipe.expire(self._job_key(job_id), self.ttl)
+        pipe.execute()
+        return job_id
+
+    def set_state(self, job_id: str, state: str, error: str = "") -> None:
+        try:
+            self._update(job_id, [
+                ("HSET", "state", state),
+                ("HSET", "error", error),
+                ("HSET", "updated_at", timezone.now().isoformat()),
+            ], refresh_ttl=True)
+        except RedisError as e:
+            logger.warning(f"Sync job {job_id} state unavailable: {e}")
+
+    def add_pages(self, job_id: str, pages: int = 1) -> None:
+        try:
+            self._update(job_id, [("HINCRBY", "pages_fetched", pages)])
+        except RedisError as e:
+            logger.warning(f"Sync job {job_id} progress unavailable: {e}")
+
+    def add_results(self, job_id: str, results: dict[str, SocialPostSyncResult]) -> None:
+        """Count the rows written for finished collections and keep their summaries."""
+        rows = sum(result.created + result.updated + result.deleted for result in results.values())
+        commands = [("HINCRBY", "rows_written", rows)]
+        commands += [
+            ("HSET", f"result:{collection}", result.model_dump_json()) for collection, result in results.items()
+        ]
+        try:
+            self._update(job_id, commands)
+        except RedisError as e:
+            logger.warning(f"Sync job {job_id} progress unavailable: {e}")
+
+    def get(self, job_id: str) -> dict | None:
+        """Return a job record, or None if it does not exist, has expired or is incomplete."""
+        raw = self.redis_client.hgetall(self._job_key(job_id))
+        job = {key.decode(): value.decode() for key, value in raw.items()}
+        if not {"user_id", "state", "collections", "created_at", "updated_at"} <= job.keys():
+            return None
+        return {
+            "job_id": job_id,
+            "user_id": int(job["user_id"]),
+            "state": job["state"],
+            "collections": job["collections"].split(","),
+            "pages_fetched": int(job.get("pages_fetched", 0)),
+            "rows_written": int(job.get("rows_written", 0)),
+            "results": {
+                key.removeprefix("result:"): json.loads(value)
+                for key, value in job.items() if key.startswith("result:")
+            },
+            "error": job.get("error") or None,
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
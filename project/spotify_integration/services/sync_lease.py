@@ -0,0 +1,88 @@
+import logging
+import secrets
+
+from django.conf import settings
+from redis import Redis, RedisError
+
+from spotify_integration.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Delete the lease only if it still belongs to the caller, and report whether a duplicate was coalesced into it.
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+return redis.call('DEL', KEYS[2])
+"""
+
+
+class SyncLeaseService:
+    """
+    Redis leases that let only one sync of a user's collection run at a time.
+
+    A sync takes the lease of each (user, post_type) it is going to write. A duplicate request for a leased
+    collection is suppressed. In `coalesce` mode (`SPOTIFY_SYNC_DEDUP_MODE`) it leaves a pending mark,
+    and the lease holder reruns the collection once after it finishes, so a change that triggered
+    the duplicate is not lost. In `drop` mode the duplicate is discarded.
+    Leases expire after `SPOTIFY_SYNC_LEASE_TTL` seconds in case a worker dies while holding one.
+    """
+
+    def __init__(self, redis_client: Redis | None = None, mode: str | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.mode = mode or settings.SPOTIFY_SYNC_DEDUP_MODE
+        self.lease_ttl = settings.SPOTIFY_SYNC_LEASE_TTL
+        self.prefix = "spotify:sync_lease"
+        self.stats_key = f"{self.prefix}:stats"
+        self._release_script = self.redis_client.register_script(RELEASE_LEASE_SCRIPT)
+
+    def _lease_key(self, user_id: int, post_type: str) -> str:
+        return f"{self.prefix}:{user_id}:{post_type}"
+
+    def _pending_key(self, user_id: int, post_type: str) -> str:
+        return f"{self.prefix}:{user_id}:{post_type}:pending"
+
+    def acquire(self, user_id: int, post_type: str) -> str | None:
+        """Take the lease of a user's collection. Return the lease token, or None if a sync already holds it."""
+        token = secrets.token_hex(8)
+        try:
+            if self.redis_client.set(self._lease_key(user_id, post_type), token, nx=True, ex=self.lease_ttl):
+                return token
+
+            pipe = self.redis_client.pipeline()
+            if self.mode == "coalesce":
+                pipe.set(self._pending_key(user_id, post_type), 1, ex=self.lease_ttl)
+            pipe.hincrby(self.stats_key, "suppressed", 1)
+            pipe.execute()
+        except RedisError as e:
+            # Fail open: without Redis duplicates are possible, but synchronization keeps working.
+            logger.warning(f"Sync lease unavailable for user {user_id} {post_type}: {e}")
+            return token
+        logger.info(f"Suppressed duplicate Spotify {post_type} sync for user {user_id} ({self.mode}).")
+        return None
+
+    def release(self, user_id: int, post_type: str, token: str) -> bool:
+        """Release a lease. Return True if a duplicate was coalesced into it, i.e. the collection should run again."""
+        try:
+            return bool(self._release_script(
+                keys=[self._lease_key(user_id, post_type), self._pending_key(user_id, post_type)],
+                args=[token],
+            ))
+        except RedisError as e:
+            logger.warning(f"Sync lease unavailable for user {user_id} {post_type}: {e}")
+            return False
+
+    def record_coalesced(self, count: int) -> None:
+        try:
+            self.redis_client.hincrby(self.stats_key, "coalesced", count)
+        except RedisError:
+            pass
+
+    def get_stats(self) -> dict:
+        """Return cluster-wide dedup counters: suppressed duplicates and reruns of coalesced ones."""
+        raw = self.redis_client.hgetall(self.stats_key)
+        stats = {key.decode(): int(value) for key, value in raw.items()}
+        return {
+            "suppressed": stats.get("suppressed", 0),
+            "coalesced": stats.get("coalesced", 0),
+        }
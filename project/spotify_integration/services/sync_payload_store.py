@@ -0,0 +1,35 @@
+import secrets
+import zlib
+
+from django.conf import settings
+from redis import Redis
+
+from spotify_integration.schemes import SocialPostBatch
+from spotify_integration.services.redis_client import get_redis_client
+
+
+class SyncPayloadStore:
+    """
+    Hands fetched collections from the fetch queue to the write queue through Redis.
+
+    Only the key travels in the Celery message, so a large library does not bloat the broker.
+    Payloads are compressed and expire after `SPOTIFY_SYNC_PAYLOAD_TTL` seconds if the write stage never runs.
+    """
+
+    def __init__(self, redis_client: Redis | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.prefix = "spotify:sync_payload"
+        self.ttl = settings.SPOTIFY_SYNC_PAYLOAD_TTL
+
+    def put(self, batch: SocialPostBatch) -> str:
+        """Store a batch and return its key."""
+        key = f"{self.prefix}:{secrets.token_hex(16)}"
+        self.redis_client.set(key, zlib.compress(batch.model_dump_json().encode(), 1), ex=self.ttl)
+        return key
+
+    def pop(self, key: str) -> SocialPostBatch | None:
+        """Return and delete a stored batch, or None if it has expired."""
+        payload = self.redis_client.getdel(key)
+        if payload is None:
+            return None
+        return SocialPostBatch.model_validate_json(zlib.decompress(payload))
@@ -0,0 +1,103 @@
+import logging
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from itertools import batched
+
+from django.conf import settings
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+from redis import Redis, RedisError
+
+from spotify_integration.models import SocialCredential, SocialSyncSchedule
+from spotify_integration.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Advance the last processed tick by at most ARGV[2] ticks, skipping ticks older than one cycle (ARGV[3] slots),
+# and return the first and last tick claimed now, or nothing if the tick was already processed.
+CLAIM_TICKS_SCRIPT = """
+local tick = tonumber(ARGV[1])
+local last_tick = redis.call('GET', KEYS[1])
+local first_tick = tick
+if last_tick then
+    first_tick = math.max(tonumber(last_tick) + 1, tick - tonumber(ARGV[3]) + 1)
+end
+if first_tick > tick then
+    return {}
+end
+local last_claimed_tick = math.min(tick, first_tick + tonumber(ARGV[2]) - 1)
+redis.call('SET', KEYS[1], last_claimed_tick)
+return {first_tick, last_claimed_tick}
+"""
+
+
+class SpotifySyncScheduler:
+    """
+    Picks the users due for a Spotify sync on every beat tick.
+
+    Each user has a `SocialSyncSchedule` whose interval adapts to how often the library changes;
+    a tick enqueues the users whose `next_sync_at` has passed. Users without a schedule yet are spread
+    evenly over the sync period (`FETCH_ALL_SPOTIFY_DATA`): it is divided into slots of
+    `SPOTIFY_SYNC_SLOT_SECONDS`, every user has the stable slot `user_id % slots`, and a tick takes
+    only the users of the current slot. The last processed tick is kept in Redis, so slots missed
+    by a late or skipped tick are caught up, at most `SPOTIFY_SYNC_MAX_SLOTS_PER_TICK` per tick,
+    so the backlog of a beat outage drains over the following ticks instead of in one burst.
+    """
+
+    def __init__(self, redis_client: Redis | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.slot_seconds = settings.SPOTIFY_SYNC_SLOT_SECONDS
+        self.slots = max(1, settings.FETCH_ALL_SPOTIFY_DATA // self.slot_seconds)
+        self.max_slots_per_tick = max(1, settings.SPOTIFY_SYNC_MAX_SLOTS_PER_TICK)
+        self.last_tick_key = "spotify:sync_schedule:last_tick"
+        self._claim_ticks_script = self.redis_client.register_script(CLAIM_TICKS_SCRIPT)
+
+    def get_slot(self, user_id: int) -> int:
+        return user_id % self.slots
+
+    def claim_due_slots(self, now: float | None = None) -> list[int]:
+        """Return the slots to enqueue now: the oldest unprocessed ones up to the current one, at most
+        `max_slots_per_tick` of them. A tick that was already processed (e.g. a duplicate beat) returns no slots."""
+        tick = int((now or time.time()) // self.slot_seconds)
+        try:
+            claimed = self._claim_ticks_script(
+                keys=[self.last_tick_key], args=[tick, self.max_slots_per_tick, self.slots],
+            )
+        except RedisError as e:
+            logger.warning(f"Sync scheduler state unavailable, enqueueing the current slot only: {e}")
+            return [tick % self.slots]
+
+        if not claimed:
+            return []
+        first_tick, last_tick = (int(value) for value in claimed)
+        return sorted({due_tick % self.slots for due_tick in range(first_tick, last_tick + 1)})
+
+    def get_due_user_ids(self, slots: list[int], now: datetime) -> QuerySet:
+        """Return IDs of syncable users whose schedule is due, and of users without a schedule in one of `slots`."""
+        return SocialCredential.objects.get_syncable_user_ids().alias(
+            sync_slot=F("user_id") % self.slots,
+        ).filter(
+            Q(user__social_sync_schedules__platform="spotify", user__social_sync_schedules__next_sync_at__lte=now)
+            | Q(user__social_sync_schedules__isnull=True, sync_slot__in=slots)
+        )
+
+    def iter_due_user_ids(self, slots: list[int], chunk_size: int) -> Iterator[int]:
+        """Yield IDs of the users due now. Each chunk's schedules are pushed forward by their interval
+        before it is yielded, so a user is not enqueued again while its sync is queued or retried."""
+        now = timezone.now()
+        min_interval = timedelta(seconds=settings.SPOTIFY_SYNC_MIN_INTERVAL)
+        user_ids = self.get_due_user_ids(slots, now).iterator(chunk_size=chunk_size)
+        for chunk in batched(user_ids, chunk_size):
+            SocialSyncSchedule.objects.bulk_create(
+                [
+                    SocialSyncSchedule(user_id=user_id, platform="spotify", sync_interval=min_interval,
+                                       next_sync_at=now)
+                    for user_id in chunk
+                ],
+                ignore_conflicts=True,
+            )
+            SocialSyncSchedule.objects.filter(user_id__in=chunk, platform="spotify").update(
+                next_sync_at=now + F("sync_interval"),
+            )
+            yield from chunk
@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+from cryptography.fernet import InvalidToken
+from django.conf import settings
+from django.utils import timezone
+from redis import Redis, RedisError
+
+from spotify_integration import crypto
+from spotify_integration.services.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTokenCache:
+    """
+    Two-tier cache of decrypted Spotify access tokens, keyed by user ID.
+
+    The first tier is an in-process LRU, the second an optional Redis tier shared by all workers,
+    where tokens are stored Fernet-encrypted. Entries live until the token's `expires_at` minus
+    `SPOTIFY_TOKEN_CACHE_EXPIRY_MARGIN`, so a cached token is always one Spotify still accepts:
+    a refreshed token replaces an old one without revoking it, so an entry left in another process
+    after `invalidate` stays usable until it expires.
+    """
+
+    STATS_FLUSH_INTERVAL = 100  # Lookups between flushes of the hit and miss counters to Redis
+
+    def __init__(self, redis_client: Redis | None = None, max_size: int | None = None, use_redis: bool | None = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.max_size = max_size or settings.SPOTIFY_TOKEN_CACHE_SIZE
+        self.use_redis = settings.SPOTIFY_TOKEN_CACHE_REDIS if use_redis is None else use_redis
+        self.expiry_margin = settings.SPOTIFY_TOKEN_CACHE_EXPIRY_MARGIN
+        self.prefix = "spotify:access_token"
+        self.stats_key = f"{self.prefix}:stats"
+        self._entries: OrderedDict[int, tuple[str, float]] = OrderedDict()  # user ID -> (token, valid until)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def _redis_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    def get(self, user_id: int) -> str | None:
+        """Return the cached token of a user, or None on a miss."""
+        with self._lock:
+            token, valid_until = self._entries.get(user_id, (None, 0.0))
+            if valid_until > time.time():
+                self._entries.move_to_end(user_id)
+            elif token:
+                token = None
+                del self._entries[user_id]
+        if token:
+            self._count("local_hits")
+            return token
+
+        token = self._get_from_redis(user_id)
+        self._count("redis_hits" if token else "misses")
+        return token
+
+    def _get_from_redis(self, user_id: int) -> str | None:
+        if not self.use_redis:
+            return None
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.get(self._redis_key(user_id))
+            pipe.pttl(self._redis_key(user_id))
+            encrypted_token, ttl_ms = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Access token cache unavailable: {e}")
+            return None
+        if not encrypted_token or ttl_ms <= 0:
+            return None
+        try:
+            token = crypto.decrypt_token(encrypted_token)
+        except InvalidToken:
+            return None
+        self._set_local(user_id, token, time.time() + ttl_ms / 1000)
+        return token
+
+    def set(self, user_id: int, token: str, expires_at: datetime) -> None:
+        """Cache a token until shortly before it expires."""
+        ttl = (expires_at - timezone.now()).total_seconds() - self.expiry_margin
+        if ttl <= 0:
+            return
+        self._set_local(user_id, token, time.time() + ttl)
+        if self.use_redis:
+            try:
+                self.redis_client.set(self._redis_key(user_id), crypto.encrypt_token(token), px=int(ttl * 1000))
+            except RedisError as e:
+                logger.warning(f"Access token cache unavailable: {e}")
+
+    def _set_local(self, user_id: int, token: str, valid_until: float) -> None:
+        with self._lock:
+            self._entries[user_id] = (token, valid_until)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's token from this process and from Redis."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self.use_redis:
+            try:
+                self.redis_client.delete(self._redis_key(user_id))
+            except RedisError as e:
+                logger.warning(f"Access token cache unavailable: {e}")
+
+    def invalidate_many(self, user_ids: list[int]) -> None:
+        """Drop the tokens of many users with a single Redis round trip."""
+        if not user_ids:
+            return
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        if self.use_redis:
+            try:
+                self.redis_client.delete(*[self._redis_key(user_id) for user_id in user_ids])
+            except RedisError as e:
+                logger.warning(f"Access token cache unavailable: {e}")
+
+    def _count(self, counter: str) -> None:
+        """Count a lookup locally. Counters go to Redis on every miss, which already costs a DB query,
+        and every `STATS_FLUSH_INTERVAL` lookups, so local hits stay free of network round trips."""
+        with self._lock:
+            self._stats[counter] += 1
+            if counter != "misses" and self._stats.total() < self.STATS_FLUSH_INTERVAL:
+                return
+            stats, self._stats = self._stats, Counter()
+        try:
+            pipe = self.redis_client.pipeline()
+            for key, value in stats.items():
+                pipe.hincrby(self.stats_key, key, value)
+            pipe.execute()
+        except RedisError:
+            pass
+
+    def get_stats(self) -> dict:
+        """Return cluster-wide cache counters, as flushed by the workers."""
+        raw = self.redis_client.hgetall(self.stats_key)
+        stats = {key.decode(): int(value) for key, value in raw.items()}
+        return {
+            "local_hits": stats.get("local_hits", 0),
+            "redis_hits": stats.get("redis_hits", 0),
+            "misses": stats.get("misses", 0),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_access_token_cache() -> AccessTokenCache:
+    """Return the process-wide access token cache."""
+    return AccessTokenCache()
+
+
+# A forked worker starts with an empty cache and a fresh lock.
+os.register_at_fork(after_in_child=get_access_token_cache.cache_clear)
@@ -0,0 +1,185 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from itertools import batched
+
+import requests
+from cryptography.fernet import InvalidToken
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from redis import RedisError
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+from spotify_integration.crypto import decrypt_token, encrypt_token
+from spotify_integration.models import SocialCredential
+from spotify_integration.schemes import TokenInfo
+from spotify_integration.services.redis_client import get_redis_client
+from spotify_integration.services.spotify_client import SpotifyApiClient
+from spotify_integration.services.spotify_service import SpotifyApiError
+from spotify_integration.services.token_cache import get_access_token_cache
+
+logger = logging.getLogger(__name__)
+
+
+def get_token_refresh_lock(user_id: int, **kwargs) -> Lock:
+    """Return the per-user Redis lock that lets only one refresh spend a user's refresh token at a time."""
+    return get_redis_client().lock(
+        f"spotify:token_refresh_lock:{user_id}", timeout=settings.SPOTIFY_TOKEN_REFRESH_LOCK_TIMEOUT, **kwargs,
+    )
+
+
+class SpotifyTokenRefreshService:
+    """
+    Batch refresh of Spotify access tokens.
+
+    Selects only credentials that expire within the refresh window, refreshes them concurrently
+    over one pooled session to the Spotify token endpoint and writes each chunk back with a single
+    `bulk_update`. Each credential is refreshed under the same per-user lock as refresh-on-read;
+    users whose lock is held are skipped, as their token is being refreshed already.
+    """
+
+    TOKEN_URL = "https://accounts.spotify.com/api/token"
+    CREDENTIAL_FIELDS = ("id", "user_id", "access_token", "refresh_token", "expires_at")
+
+    def __init__(self, concurrency: int | None = None):
+        self.concurrency = concurrency or settings.SPOTIFY_TOKEN_REFRESH_CONCURRENCY
+        self.timeout = (settings.SPOTIFY_HTTP_CONNECT_TIMEOUT, settings.SPOTIFY_HTTP_READ_TIMEOUT)
+        self.session = SpotifyApiClient._build_session(self.concurrency)
+        self.session.auth = (settings.SPOTIFY_CLIENT_ID, settings.SPOTIFY_CLIENT_SECRET)
+
+    def refresh_access_token(self, refresh_token: str) -> TokenInfo:
+        """Exchange a refresh token for a new access token."""
+        try:
+            response = self.session.post(
+                self.TOKEN_URL,
+                data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise SpotifyApiError(f"Network error requesting Spotify token endpoint: {e}") from e
+        return TokenInfo.model_validate(SpotifyApiClient.decode_response(response))
+
+    @staticmethod
+    def get_expiring_credentials(window: int | None) -> QuerySet:
+        """Return refreshable Spotify credentials expiring within `window` seconds; all of them if it is None."""
+        credentials = SocialCredential.objects.filter(
+            platform="spotify",
+            refresh_token__isnull=False,
+        ).exclude(refresh_token=b"")
+        if window is not None:
+            credentials = credentials.filter(
+                Q(expires_at__lte=timezone.now() + timedelta(seconds=window)) | Q(expires_at__isnull=True)
+            )
+        return credentials.only(*SpotifyTokenRefreshService.CREDENTIAL_FIELDS).order_by("expires_at")
+
+    @staticmethod
+    def lock_credentials(credentials: list[SocialCredential], executor: ThreadPoolExecutor) -> dict[int, Lock | None]:
+        """Take the refresh lock of each credential's user without waiting, and return the locks by user ID.
+        Users whose lock is held are left out; if Redis is unavailable, the lock is None and the user is
+        refreshed without it."""
+
+        def acquire(credential: SocialCredential) -> tuple[bool, Lock | None]:
+            # The locks are released by the calling thread after the chunk is saved.
+            lock = get_token_refresh_lock(credential.user_id, blocking=False, thread_local=False)
+            try:
+                return lock.acquire(), lock
+            except RedisError as e:
+                logger.warning(f"Token refresh lock unavailable for user {credential.user_id}: {e}")
+                return True, None
+
+        return {
+            credential.user_id: lock
+            for credential, (acquired, lock) in zip(credentials, executor.map(acquire, credentials))
+            if acquired
+        }
+
+    def refresh_credentials(self, credentials: list[SocialCredential], executor: ThreadPoolExecutor) -> tuple[int, int]:
+        """Refresh a chunk of credentials concurrently and save the refreshed ones with one `bulk_update`.
+        Return the numbers of refreshed and failed credentials; credentials skipped because their user's token
+        is being refreshed elsewhere are neither."""
+        locks = self.lock_credentials(credentials, executor)
+        try:
+            # Reload the locked credentials: a refresh that held a lock may have rotated the tokens since the chunk
+            # was selected. Credentials whose expiry changed were refreshed already.
+            current = SocialCredential.objects.only(*self.CREDENTIAL_FIELDS).in_bulk(
+                [credential.pk for credential in credentials if credential.user_id in locks]
+            )
+            to_refresh = [
+                current[credential.pk] for credential in credentials
+                if credential.pk in current and current[credential.pk].expires_at == credential.expires_at
+            ]
+            if len(to_refresh) < len(credentials):
+                logger.info(f"Skipped {len(credentials) - len(to_refresh)} Spotify tokens refreshed elsewhere.")
+            return self._refresh_locked_credentials(to_refresh, executor)
+        finally:
+            for lock in locks.values():
+                try:
+                    if lock is not None:
+                        lock.release()
+                except (LockError, RedisError):
+                    pass
+
+    def _refresh_locked_credentials(self,
+                                    credentials: list[SocialCredential],
+                                    executor: ThreadPoolExecutor,
+                                    ) -> tuple[int, int]:
+        """Refresh credentials whose users' locks are held, and save the refreshed ones with one `bulk_update`."""
+
+        def refresh(credential: SocialCredential) -> TokenInfo | None:
+            # Any failure skips only this credential, so tokens Spotify already rotated for the rest are saved.
+            try:
+                return self.refresh_access_token(decrypt_token(credential.refresh_token))
+            except (SpotifyApiError, InvalidToken) as e:
+                logger.error(f"Error refreshing Spotify token for user {credential.user_id}: {e!r}")
+            except Exception as e:
+                logger.error(f"Unexpected error refreshing Spotify token for user {credential.user_id}: {e!r}",
+                             exc_info=True)
+            return None
+
+        refreshed = []
+        now = timezone.now()
+        for credential, token_info in zip(credentials, executor.map(refresh, credentials)):
+            if token_info is None:
+                continue
+            credential.access_token = encrypt_token(token_info.access_token)
+            if token_info.refresh_token:
+                credential.refresh_token = encrypt_token(token_info.refresh_token)
+            credential.expires_at = now + timedelta(seconds=token_info.expires_in)
+            credential.updated_at = now
+            refreshed.append(credential)
+
+        SocialCredential.objects.bulk_update(
+            refreshed, ["access_token", "refresh_token", "expires_at", "updated_at"], batch_size=settings.BATCH_SIZE
+        )
+        get_access_token_cache().invalidate_many([credential.user_id for credential in refreshed])
+        return len(refreshed), len(credentials) - len(refreshed)
+
+    def refresh_expiring_tokens(self, window: int | None = None, chunk_size: int | None = None) -> tuple[int, int]:
+        """Refresh every credential expiring within `window` seconds (all credentials if None), chunk by chunk.
+        Return the numbers of refreshed and failed credentials."""
+        chunk_size = chunk_size or settings.SPOTIFY_TOKEN_REFRESH_CHUNK_SIZE
+        credentials = self.get_expiring_credentials(window).iterator(chunk_size=chunk_size)
+        refreshed = failed = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for chunk in batched(credentials, chunk_size):
+                chunk_refreshed, chunk_failed = self.refresh_credentials(list(chunk), executor)
+                refreshed += chunk_refreshed
+                failed += chunk_failed
+        return refreshed, failed
+
+    def close(self) -> None:
+        self.session.close()
+
+
+@lru_cache(maxsize=1)
+def get_token_refresh_service() -> SpotifyTokenRefreshService:
+    """Return the process-wide token refresh service for single refreshes, such as refresh-on-read."""
+    return SpotifyTokenRefreshService()
+
+
+# Prefork workers must not share the parent's token endpoint connections.
+os.register_at_fork(after_in_child=get_token_refresh_service.cache_clear)
@@ -1,110 +1,337 @@
 import logging
+import time
+from collections.abc import Iterable
+from itertools import batched
 
-from celery import shared_task
+from celery import chain, chord, current_app, group, shared_task
+from celery.exceptions import Retry
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 
-from spotify_integration.models import SocialCredential
-from spotify_integration.services import SpotifyAuthService, SpotifyDataService, SpotifyService
+from spotify_integration.models import SocialCredential, SocialSyncSchedule
+from spotify_integration.schemes import SocialPostSyncResult
+from spotify_integration.services import (
+    AsyncSpotifyDataService,
+    SpotifyAuthService,
+    SpotifyDataService,
+    SpotifyService,
+    SpotifySyncScheduler,
+    SpotifyTokenRefreshService,
+    SyncJobService,
+    SyncLeaseService,
+    SyncPayloadStore,
+)
 from spotify_integration.services.spotify_service import SpotifyApiError
 
 User = get_user_model()
 
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def fetch_spotify_tracks_task(self, user_id: int):
-    """Fetch Spotify tracks in the background."""
+def run_user_library_sync(task,
+                          user_id: int,
+                          collections: list[str],
+                          retry_failed_only: bool = False,
+                          job_id: str | None = None,
+                          ) -> None:
+    """
+    Synchronize collections of one user, loading the user and the access token once.
+    Collections already being synced elsewhere are skipped; duplicates coalesced into this run are synced again
+    by a follow-up task. Spotify API errors retry the task; with `retry_failed_only` the retry covers only
+    the failed collections. Progress is reported to the sync job `job_id`, if given.
+    """
+    job_service = SyncJobService() if job_id else None
+    lease_service = SyncLeaseService()
+    leases = {collection: lease_service.acquire(user_id, collection) for collection in collections}
+    leased = [collection for collection, token in leases.items() if token]
+    if not leased:
+        logging.info(f"Spotify {', '.join(collections)} sync for user {user_id} is already running.")
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.SKIPPED, "The collections are already being synced.")
+        return
+
+    if settings.SPOTIFY_SPLIT_SYNC_PIPELINE:
+        start_split_user_sync(user_id, {collection: leases[collection] for collection in leased}, job_id)
+        return
 
-    data_service = SpotifyDataService()
+    try:
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.RUNNING)
+        synced = _sync_user_collections(task, user_id, leased, retry_failed_only, job_id)
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.SUCCEEDED if synced else SyncJobService.FAILED)
+    except Retry as e:
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.RETRYING, str(e.exc or ""))
+        raise
+    except Exception as e:
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.FAILED, str(e))
+        raise
+    finally:
+        # Rerun coalesced duplicates even if this run retries or fails: the retry may not cover their collections.
+        release_user_leases(user_id, {collection: leases[collection] for collection in leased}, lease_service)
+
+
+def release_user_leases(user_id: int, leases: dict[str, str], lease_service: SyncLeaseService | None = None) -> None:
+    """Release the collection leases of a user; rerun the collections duplicates were coalesced into."""
+    lease_service = lease_service or SyncLeaseService()
+    coalesced = [
+        collection for collection, lease_token in leases.items()
+        if lease_service.release(user_id, collection, lease_token)
+    ]
+    if coalesced:
+        lease_service.record_coalesced(len(coalesced))
+        sync_user_library_task.delay(user_id, collections=coalesced)
+
+
+def _sync_user_collections(task,
+                           user_id: int,
+                           collections: list[str],
+                           retry_failed_only: bool,
+                           job_id: str | None,
+                           ) -> bool:
+    """Sync the given collections; return False if the user does not exist."""
+
+    job_service = SyncJobService() if job_id else None
+    data_service = SpotifyDataService(on_page=(lambda: job_service.add_pages(job_id)) if job_service else None)
     auth_service = SpotifyAuthService()
 
     try:
         user = User.objects.get(pk=user_id)
         access_token = auth_service.get_access_token(user)
-        tracks_spotify_data = data_service.fetch_user_tracks(access_token)
-        social_posts = data_service.map_tracks_to_social_posts(user, tracks_spotify_data)
-        data_service.bulk_update_social_posts(
-            user=user,
-            platform="spotify",
-            post_type="tracks",
-            social_posts=social_posts,
-        )
-        logging.info(f"Fetched Spotify tracks for user {user.id} successfully.")
 
     except User.DoesNotExist:
         logging.error(f"User with ID {user_id} does not exist.", exc_info=True)
+        return False
 
     except SpotifyApiError as e:
         logging.warning(f"Spotify API error for user {user_id}: {e}", exc_info=True)
-        raise self.retry(exc=e)
+        raise task.retry(exc=e, countdown=e.retry_after)
 
     except Exception as e:
         logging.error(f"Unexpected error for user {user_id}: {e}", exc_info=True)
-        raise SpotifyApiError("Failed to fetch Spotify tracks.") from e
+        raise SpotifyApiError(f"Failed to fetch Spotify {', '.join(collections)}.") from e
+
+    results = data_service.sync_user_library(user, access_token, collections)
+    succeeded = {
+        collection: result for collection, result in results.items() if isinstance(result, SocialPostSyncResult)
+    }
+    timings = ", ".join(f"{collection} {result.duration:.2f}s" for collection, result in succeeded.items())
+    logging.info(f"Fetched Spotify {', '.join(collections)} for user {user.id}: {timings or 'nothing synced'}.")
+    if job_service:
+        job_service.add_results(job_id, succeeded)
+
+    failed = {collection: error for collection, error in results.items() if isinstance(error, Exception)}
+    if not failed:
+        SocialSyncSchedule.objects.record_sync(
+            user,
+            "spotify",
+            changed=any(result.has_changes for result in succeeded.values()),
+            complete=set(SpotifyDataService.COLLECTIONS) <= set(collections),
+        )
+    api_errors = [error for error in failed.values() if isinstance(error, SpotifyApiError)]
+    if api_errors:
+        retry_after = max(error.retry_after or 0 for error in api_errors) or None
+        if retry_failed_only:
+            raise task.retry(exc=api_errors[0], countdown=retry_after, args=(),
+                             kwargs={"user_id": user_id, "collections": list(failed), "job_id": job_id})
+        raise task.retry(exc=api_errors[0], countdown=retry_after)
+    if failed:
+        raise SpotifyApiError(f"Failed to fetch Spotify {', '.join(failed)}.") from next(iter(failed.values()))
+    return True
+
+
+def start_split_user_sync(user_id: int, leases: dict[str, str], job_id: str | None = None) -> None:
+    """
+    Run a library sync as a fetch stage and a write stage per collection: fetch tasks go to the I/O-bound
+    fetch queue, write tasks to the small DB-bound write queue, and a final task records the sync schedule.
+    Collection leases are passed along and released by the write stage.
+    """
+    chord(
+        chain(
+            fetch_spotify_collection_task.s(user_id, collection, lease_token, job_id=job_id),
+            write_spotify_collection_task.s(user_id, collection, lease_token, job_id=job_id),
+        )
+        for collection, lease_token in leases.items()
+    )(finish_spotify_sync_task.s(user_id, list(leases), job_id=job_id))
+
+
+def release_collection_lease(user_id: int, post_type: str, lease_token: str) -> None:
+    """Release the lease of a split-sync collection; rerun the collection if a duplicate was coalesced into it."""
+    release_user_leases(user_id, {post_type: lease_token})
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def fetch_spotify_playlists_task(self, user_id: int):
-    """Fetch Spotify playlists in the background."""
+def fetch_spotify_collection_task(self, user_id: int, post_type: str, lease_token: str, job_id: str | None = None):
+    """Fetch stage: fetch and map one collection, store it for the write stage and return its payload key."""
 
-    data_service = SpotifyDataService()
+    job_service = SyncJobService() if job_id else None
+    data_service = SpotifyDataService(on_page=(lambda: job_service.add_pages(job_id)) if job_service else None)
     auth_service = SpotifyAuthService()
 
     try:
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.RUNNING)
         user = User.objects.get(pk=user_id)
         access_token = auth_service.get_access_token(user)
-        playlists_spotify_data = data_service.fetch_user_playlists(access_token)
-        social_posts = data_service.map_playlists_to_social_posts(user, playlists_spotify_data)
-        data_service.bulk_update_social_posts(
-            user=user,
-            platform="spotify",
-            post_type="playlists",
-            social_posts=social_posts,
-        )
-        logging.info(f"Fetched Spotify playlists for user {user.id} successfully.")
-
-    except User.DoesNotExist:
-        logging.error(f"User with ID {user_id} does not exist.", exc_info=True)
+        batch = data_service.fetch_user_collection(user, access_token, post_type)
+        return SyncPayloadStore().put(batch)
 
     except SpotifyApiError as e:
         logging.warning(f"Spotify API error for user {user_id}: {e}", exc_info=True)
-        raise self.retry(exc=e)
+        if self.request.retries < self.max_retries:
+            if job_service:
+                job_service.set_state(job_id, SyncJobService.RETRYING, str(e))
+            raise self.retry(exc=e, countdown=e.retry_after)
+        # Out of retries: the chord never reaches the write stage, so end the job and free the collection here.
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.FAILED, str(e))
+        release_collection_lease(user_id, post_type, lease_token)
+        raise
 
     except Exception as e:
-        logging.error(f"Unexpected error for user {user_id}: {e}", exc_info=True)
-        raise SpotifyApiError("Failed to fetch Spotify playlists.") from e
+        logging.error(f"Unexpected error fetching Spotify {post_type} for user {user_id}: {e}", exc_info=True)
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.FAILED, str(e))
+        release_collection_lease(user_id, post_type, lease_token)
+        raise
+
+
+@shared_task
+def write_spotify_collection_task(payload_key: str,
+                                  user_id: int,
+                                  post_type: str,
+                                  lease_token: str,
+                                  job_id: str | None = None,
+                                  ) -> dict:
+    """Write stage: apply a fetched collection in one transaction and release the collection lease."""
+
+    data_service = SpotifyDataService()
+    job_service = SyncJobService() if job_id else None
+
+    try:
+        batch = SyncPayloadStore().pop(payload_key)
+        if batch is None:
+            raise SpotifyApiError(f"Fetched Spotify {post_type} for user {user_id} expired before being written.")
+        result = data_service.write_user_collection(User.objects.get(pk=user_id), batch)
+    except Exception as e:
+        if job_service:
+            job_service.set_state(job_id, SyncJobService.FAILED, str(e))
+        raise
+    finally:
+        release_collection_lease(user_id, post_type, lease_token)
+
+    if job_service:
+        job_service.add_results(job_id, {post_type: result})
+    logging.info(f"Wrote Spotify {post_type} for user {user_id} in {result.duration:.2f}s.")
+    return result.model_dump()
+
+
+@shared_task
+def finish_spotify_sync_task(results: list[dict],
+                             user_id: int,
+                             collections: list[str] | None = None,
+                             job_id: str | None = None,
+                             ):
+    """Record a finished split sync of `collections` in the user's adaptive sync schedule."""
+    user = User.objects.get(pk=user_id)
+    changed = any(SocialPostSyncResult.model_validate(result).has_changes for result in results)
+    complete = collections is None or set(SpotifyDataService.COLLECTIONS) <= set(collections)
+    SocialSyncSchedule.objects.record_sync(user, "spotify", changed=changed, complete=complete)
+    if job_id:
+        SyncJobService().set_state(job_id, SyncJobService.SUCCEEDED)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def sync_user_library_task(self, user_id: int, collections: list[str] | None = None, job_id: str | None = None):
+    """Fetch Spotify tracks, playlists and following of one user in the background, concurrently."""
+    run_user_library_sync(
+        self, user_id, collections or list(SpotifyDataService.COLLECTIONS), retry_failed_only=True, job_id=job_id,
+    )
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def fetch_spotify_tracks_task(self, user_id: int):
+    """Fetch Spotify tracks in the background."""
+    run_user_library_sync(self, user_id, ["tracks"])
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def fetch_spotify_playlists_task(self, user_id: int):
+    """Fetch Spotify playlists in the background."""
+    run_user_library_sync(self, user_id, ["playlists"])
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def fetch_spotify_following_task(self, user_id: int):
     """Fetch Spotify following in the background."""
+    run_user_library_sync(self, user_id, ["following"])
+
+
+@shared_task
+def fetch_spotify_data_async_task(user_ids: list[int]):
+    """
+    Fetch Spotify tracks, playlists and following for many users on one asyncio event loop.
+    Like `run_user_library_sync`, it takes the collection leases of each user, skipping users with a sync
+    already running, and records finished syncs in the adaptive sync schedule.
+    """
 
     data_service = SpotifyDataService()
     auth_service = SpotifyAuthService()
+    lease_service = SyncLeaseService()
+    mappers = {
+        "tracks": data_service.map_tracks_to_social_posts,
+        "playlists": data_service.map_playlists_to_social_posts,
+        "following": data_service.map_following_artists_to_social_posts,
+    }
+
+    users = User.objects.in_bulk(user_ids)
+    user_leases = {}
+    for user_id in users:
+        leases = {
+            collection: lease_service.acquire(user_id, collection) for collection in SpotifyDataService.COLLECTIONS
+        }
+        acquired = {collection: token for collection, token in leases.items() if token}
+        if len(acquired) == len(leases):
+            user_leases[user_id] = acquired
+        else:
+            logging.info(f"Skipping Spotify async fetch for user {user_id}: a sync is already running.")
+            release_user_leases(user_id, acquired, lease_service)
 
     try:
-        user = User.objects.get(pk=user_id)
-        access_token = auth_service.get_access_token(user)
-        following_spotify_data = data_service.fetch_user_following(access_token)
-        social_posts = data_service.map_following_artists_to_social_posts(user, following_spotify_data)
-        data_service.bulk_update_social_posts(
-            user=user,
-            platform="spotify",
-            post_type="following",
-            social_posts=social_posts,
-        )
-        logging.info(f"Fetched Spotify following for user {user.id} successfully.")
-
-    except User.DoesNotExist:
-        logging.error(f"User with ID {user_id} does not exist.", exc_info=True)
-
-    except SpotifyApiError as e:
-        logging.warning(f"Spotify API error for user {user_id}: {e}", exc_info=True)
-        raise self.retry(exc=e)
-
-    except Exception as e:
-        logging.error(f"Unexpected error for user {user_id}: {e}", exc_info=True)
-        raise SpotifyApiError("Failed to fetch Spotify following.") from e
+        access_tokens = {}
+        for user_id in user_leases:
+            try:
+                access_tokens[user_id] = auth_service.get_access_token(users[user_id])
+            except Exception as e:
+                # Missing credentials, or a refresh-on-read failure such as a revoked grant, skip only this user.
+                logging.warning(f"Skipping Spotify async fetch for user {user_id}: {e!r}")
+
+        results = AsyncSpotifyDataService.run(access_tokens)
+
+        for user_id, collections in results.items():
+            user = users[user_id]
+            synced = {}
+            for post_type, spotify_data in collections.items():
+                if isinstance(spotify_data, BaseException):
+                    logging.error(f"Spotify {post_type} fetch failed for user {user_id}: {spotify_data}")
+                    continue
+                try:
+                    synced[post_type] = data_service.bulk_update_social_posts(
+                        user=user,
+                        platform="spotify",
+                        post_type=post_type,
+                        social_posts=mappers[post_type](user, spotify_data),
+                    )
+                except Exception as e:
+                    logging.error(f"Error saving Spotify {post_type} for user {user_id}: {e}", exc_info=True)
+            changed = any(result.has_changes for result in synced.values())
+            SocialSyncSchedule.objects.record_sync(
+                user, "spotify", changed=changed, complete=len(synced) == len(collections),
+            )
+    finally:
+        for user_id, leases in user_leases.items():
+            release_user_leases(user_id, leases, lease_service)
+    logging.info(f"Fetched Spotify data asynchronously for {len(results)} users.")
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
@@ -135,39 +362,51 @@ def refresh_access_token_task(self, user_id: int):
 
 @shared_task
 def refresh_all_spotify_tokens_task():
-    """Refresh access tokens for all users with Spotify credentials."""
-    spotify_service = SpotifyService()
-    auth_service = SpotifyAuthService()
-
-    credentials = SocialCredential.objects.filter(
-        platform="spotify"
-    ).filter(
-        ~Q(refresh_token=b""),
-        refresh_token__isnull=False
-    )
-    for credential in credentials:
-        try:
-            token_info = spotify_service.refresh_access_token(credential.refresh_token_value)
-            auth_service.create_or_update_user_credentials(credential.user, token_info)
-            logging.info(f"Refreshed Spotify access token for user {credential.user.id} successfully.")
-        except Exception as e:
-            logging.error(f"Error refreshing Spotify token for user {credential.user.id}: {e}", exc_info=True)
+    """Refresh Spotify access tokens that expire before the next refresh run."""
+    refresh_service = SpotifyTokenRefreshService()
+    try:
+        refreshed, failed = refresh_service.refresh_expiring_tokens(window=settings.SPOTIFY_TOKEN_REFRESH_WINDOW)
+    finally:
+        refresh_service.close()
+    logging.info(f"Refreshed {refreshed} Spotify access tokens, {failed} failed.")
+
+
+def dispatch_spotify_sync(user_ids: Iterable[int], chunk_size: int | None = None) -> int:
+    """
+    Publish sync tasks for the given users and return the number of users.
+    Users are published in groups of `chunk_size` over one broker connection instead of one `.delay()` per task.
+    """
+    chunk_size = chunk_size or settings.SPOTIFY_DISPATCH_CHUNK_SIZE
+    dispatched = 0
+    with current_app.producer_or_acquire() as producer:
+        for chunk in batched(user_ids, chunk_size):
+            group(sync_user_library_task.s(user_id) for user_id in chunk).apply_async(producer=producer)
+            dispatched += len(chunk)
+    return dispatched
 
 
 @shared_task
 def fetch_all_spotify_data_task():
     """Fetch Spotify data for all users with Spotify credentials."""
-    users = SocialCredential.objects.filter(
-        platform="spotify"
-    ).filter(
-        ~Q(refresh_token=b""),
-        refresh_token__isnull=False
-    ).values_list("user_id", flat=True)
-    for user_id in users:
-        try:
-            fetch_spotify_tracks_task.delay(user_id)
-            fetch_spotify_playlists_task.delay(user_id)
-            fetch_spotify_following_task.delay(user_id)
-            logging.info(f"Started fetching Spotify data for user {user_id}.")
-        except Exception as e:
-            logging.error(f"Error fetching Spotify data for user {user_id}: {e}", exc_info=True)
+    chunk_size = settings.SPOTIFY_DISPATCH_CHUNK_SIZE
+    started_at = time.monotonic()
+    user_ids = SocialCredential.objects.get_syncable_user_ids().iterator(chunk_size=chunk_size)
+    dispatched = dispatch_spotify_sync(user_ids, chunk_size=chunk_size)
+    elapsed = time.monotonic() - started_at
+    logging.info(f"Started fetching Spotify data for {dispatched} users in {elapsed:.2f}s "
+                 f"({dispatched / elapsed if elapsed else 0:.0f} users/s).")
+
+
+@shared_task
+def fetch_scheduled_spotify_data_task():
+    """Fetch Spotify data for the users that are due for a sync."""
+    scheduler = SpotifySyncScheduler()
+    slots = scheduler.claim_due_slots()
+    if not slots:
+        return
+
+    chunk_size = settings.SPOTIFY_DISPATCH_CHUNK_SIZE
+    started_at = time.monotonic()
+    dispatched = dispatch_spotify_sync(scheduler.iter_due_user_ids(slots, chunk_size), chunk_size=chunk_size)
+    elapsed = time.monotonic() - started_at
+    logging.info(f"Started fetching Spotify data for {dispatched} due users in {elapsed:.2f}s.")
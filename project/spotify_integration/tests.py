@@ -1,2 +1,442 @@
+import threading
+import uuid
+from datetime import UTC, date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from json_handlers import ORJSONRenderer
+from redis import RedisError
+from rest_framework.renderers import JSONRenderer
+
+from spotify_integration.models import SocialCredential, SocialPost, SocialSyncState
+from spotify_integration.reconciliation import PostgresSocialPostReconciler
+from spotify_integration.schemes import SocialPostScheme, TokenInfo
+from spotify_integration.services import (
+    SocialFeedService,
+    SpotifyAuthService,
+    SpotifyDataService,
+    SpotifySyncScheduler,
+    SpotifyTokenRefreshService,
+    SyncLeaseService,
+    get_access_token_cache,
+)
+from spotify_integration.services.redis_client import get_redis_client
+from spotify_integration.services.social_feed_service import InvalidCursorError
+from spotify_integration.services.token_refresh_service import get_token_refresh_lock
+
+
+def make_post(key: str, title: str | None = None, snapshot_id: str | None = None) -> SocialPostScheme:
+    return SocialPostScheme(
+        platform="spotify",
+        external_id=key,
+        external_url=f"https://open.spotify.com/playlist/{key}",
+        external_username="owner",
+        external_user_url="https://open.spotify.com/user/owner",
+        title=title or key,
+        snapshot_id=snapshot_id,
+    )
+
+
+class SocialPostReconciliationTests(TestCase):
+    """Created/updated/unchanged/deleted counts of `SocialPost.bulk_update_social_posts`."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="listener")
+        self.initial_posts = [make_post("a"), make_post("b"), make_post("c", snapshot_id="s1"), make_post("e")]
+        # "a" is the same, "b" changed, "c" changed its title but not its snapshot, "d" is new, "e" is gone.
+        self.next_posts = [make_post("a"), make_post("b", title="b v2"), make_post("c", title="c v2", snapshot_id="s1"),
+                           make_post("d")]
+
+    def sync(self, posts: list[SocialPostScheme]):
+        return SocialPost.bulk_update_social_posts(self.user, "spotify", "playlists", posts)
+
+    def assert_reconciled(self, result):
+        self.assertEqual((result.created, result.updated, result.unchanged, result.deleted), (1, 1, 2, 1))
+        titles = dict(SocialPost.objects.filter(user=self.user).values_list("external_id", "title"))
+        self.assertEqual(titles, {"a": "a", "b": "b v2", "c": "c", "d": "d"})
+
+    @override_settings(SOCIAL_POSTS_SQL_RECONCILIATION=False)
+    def test_python_fallback_counts(self):
+        result = self.sync(self.initial_posts)
+        self.assertEqual((result.created, result.updated, result.unchanged, result.deleted), (4, 0, 0, 0))
+
+        self.assert_reconciled(self.sync(self.next_posts))
+
+    @override_settings(SOCIAL_POSTS_SQL_RECONCILIATION=False)
+    def test_python_fallback_chunks(self):
+        self.sync(self.initial_posts)
+
+        # A post repeated in a later chunk is counted once.
+        result = SocialPost.bulk_update_social_posts_stream(
+            self.user, "spotify", "playlists", [self.next_posts[:2], self.next_posts[1:]],
+        )
+        self.assert_reconciled(result)
+
+    def test_postgres_reconciler_counts(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("The staging-table reconciliation requires PostgreSQL.")
+
+        for use_copy in (False, True):
+            with self.subTest(use_copy=use_copy):
+                SocialPost.objects.filter(user=self.user).delete()
+                reconciler = PostgresSocialPostReconciler(SocialPost, self.user, "spotify", "playlists", use_copy)
+                result = reconciler.reconcile([self.initial_posts])
+                self.assertEqual((result.created, result.updated, result.unchanged, result.deleted), (4, 0, 0, 0))
+
+                reconciler = PostgresSocialPostReconciler(SocialPost, self.user, "spotify", "playlists", use_copy)
+                self.assert_reconciled(reconciler.reconcile([self.next_posts]))
+
+
+class FakeSpotifyClient:
+    """Serves `/me/tracks` pages from an in-memory library, newest track first, and records requested offsets."""
+
+    def __init__(self):
+        self.library = []
+        self.offsets = []
+
+    def add_tracks(self, *keys: str):
+        now = timezone.now()
+        tracks = [
+            {
+                "added_at": (now + timedelta(seconds=len(self.library) + index)).isoformat(),
+                "track": {
+                    "id": key,
+                    "name": key,
+                    "external_urls": {"spotify": f"https://open.spotify.com/track/{key}"},
+                    "album": {"images": []},
+                },
+            }
+            for index, key in enumerate(keys)
+        ]
+        self.library[:0] = reversed(tracks)
+
+    def get(self, url: str, access_token: str, params: dict | None = None) -> dict:
+        offset, limit = params["offset"], params["limit"]
+        self.offsets.append(offset)
+        return {"items": self.library[offset:offset + limit], "total": len(self.library)}
+
+
+@override_settings(SPOTIFY_INCREMENTAL_SYNC=True, DEFAULT_LIMIT=2)
+class SpotifyIncrementalTracksSyncTests(TestCase):
+    """Incremental sync of saved tracks by `SpotifyDataService.sync_user_tracks` (pages of two tracks)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="listener")
+        self.client = FakeSpotifyClient()
+        self.data_service = SpotifyDataService(client=self.client)
+        self.client.add_tracks("a", "b", "c", "d", "e")
+        self.sync()
+        self.client.offsets.clear()
+
+    def sync(self):
+        return self.data_service.sync_user_tracks(self.user, "token")
+
+    def assert_synced(self):
+        track_ids = SocialPost.objects.filter(user=self.user, post_type="tracks").values_list("external_id", flat=True)
+        self.assertCountEqual(track_ids, [f"track_{track['track']['id']}" for track in self.client.library])
+        state = SocialSyncState.objects.get(user=self.user, platform="spotify", post_type="tracks")
+        self.assertEqual(state.total_count, len(self.client.library))
+        self.assertEqual(state.last_posted_at.isoformat(), self.client.library[0]["added_at"])
+
+    def test_first_sync_is_full(self):
+        self.assert_synced()
+
+    def test_only_tracks_after_high_water_mark_are_fetched(self):
+        self.client.add_tracks("f", "g", "h")
+        result = self.sync()
+
+        self.assertEqual((result.created, result.updated, result.unchanged, result.deleted), (3, 0, 5, 0))
+        # "f", "g" and "h" fill the first page and a half; the known "e" on the second page ends the fetch.
+        self.assertEqual(self.client.offsets, [0, 2])
+        self.assert_synced()
+
+    def test_no_new_tracks(self):
+        result = self.sync()
+
+        self.assertEqual((result.created, result.updated, result.unchanged, result.deleted), (0, 0, 5, 0))
+        self.assertEqual(self.client.offsets, [0])
+        self.assert_synced()
+
+    def test_removed_track_falls_back_to_full_reconciliation(self):
+        del self.client.library[2]
+        self.client.add_tracks("f")
+        result = self.sync()
+
+        self.assertEqual((result.created, result.updated, result.unchanged, result.deleted), (1, 0, 4, 1))
+        self.assertEqual(self.client.offsets, [0, 0, 2, 4])
+        self.assert_synced()
+
+
+class SocialFeedPaginationTests(TestCase):
+    """Keyset pagination of `SocialFeedService` over posts sharing `posted_at`, and posts without one."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="listener")
+        self.feed_service = SocialFeedService()
+        now = timezone.now()
+        SocialPost.objects.bulk_create(
+            SocialPost(
+                user=self.user,
+                platform="spotify",
+                post_type="tracks",
+                external_id=str(index),
+                external_url=f"https://open.spotify.com/track/{index}",
+                external_username="artist",
+                # Groups of three posts share a date; every fifth post has none.
+                posted_at=None if index % 5 == 0 else now - timedelta(minutes=index // 3),
+            )
+            for index in range(23)
+        )
+
+    def collect_pages(self, page_size: int) -> list[int]:
+        post_ids, cursor = [], None
+        while True:
+            posts, cursor = self.feed_service.get_page(self.user, "spotify", "tracks", page_size, cursor)
+            self.assertLessEqual(len(posts), page_size)
+            post_ids += [post.pk for post in posts]
+            if cursor is None:
+                return post_ids
+
+    def test_pages_cover_every_post_once_in_order(self):
+        expected = list(
+            self.feed_service.get_queryset(self.user, "spotify", "tracks").values_list("pk", flat=True)
+        )
+        for page_size in (1, 2, 3, 4, 7, 23, 50):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.collect_pages(page_size), expected)
+
+    def test_posts_without_date_come_first(self):
+        posts, _ = self.feed_service.get_page(self.user, "spotify", "tracks", 5)
+        self.assertTrue(all(post.posted_at is None for post in posts))
+
+    def test_new_posts_do_not_shift_next_page(self):
+        _, cursor = self.feed_service.get_page(self.user, "spotify", "tracks", 10)
+        second_page, _ = self.feed_service.get_page(self.user, "spotify", "tracks", 10, cursor)
+        SocialPost.objects.create(user=self.user, platform="spotify", post_type="tracks", external_id="new",
+                                  external_url="https://open.spotify.com/track/new", external_username="artist",
+                                  posted_at=timezone.now())
+
+        self.assertEqual(self.feed_service.get_page(self.user, "spotify", "tracks", 10, cursor)[0], second_page)
+
+    def test_invalid_cursor(self):
+        for cursor in ("not-base64!", "bm90IGpzb24=", "WzFd"):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursorError):
+                self.feed_service.get_page(self.user, "spotify", "tracks", 10, cursor)
+
+
+@override_settings(FETCH_ALL_SPOTIFY_DATA=600, SPOTIFY_SYNC_SLOT_SECONDS=60, SPOTIFY_SYNC_MAX_SLOTS_PER_TICK=2)
+class SpotifySyncSchedulerSlotTests(SimpleTestCase):
+    """Claiming of due slots by `SpotifySyncScheduler.claim_due_slots` (10 slots of 60 seconds)."""
+
+    def setUp(self):
+        try:
+            get_redis_client().ping()
+        except RedisError:
+            self.skipTest("Redis is not available.")
+        self.scheduler = SpotifySyncScheduler()
+        self.scheduler.last_tick_key = f"test:sync_schedule:last_tick:{uuid.uuid4().hex}"
+        self.addCleanup(self.scheduler.redis_client.delete, self.scheduler.last_tick_key)
+
+    def claim(self, tick: int) -> list[int]:
+        return self.scheduler.claim_due_slots(now=tick * 60 + 1)
+
+    def test_first_tick_claims_current_slot(self):
+        self.assertEqual(self.claim(1003), [3])
+
+    def test_tick_is_claimed_once(self):
+        self.assertEqual(self.claim(1003), [3])
+        self.assertEqual(self.claim(1003), [])
+        self.assertEqual(self.claim(1002), [])
+        self.assertEqual(self.claim(1004), [4])
+
+    def test_missed_ticks_are_caught_up_gradually(self):
+        self.claim(1000)
+        self.assertEqual(self.claim(1005), [1, 2])
+        self.assertEqual(self.claim(1006), [3, 4])
+        self.assertEqual(self.claim(1007), [5, 6])
+        self.assertEqual(self.claim(1008), [7, 8])
+        self.assertEqual(self.claim(1009), [9])
+
+    def test_catch_up_reaches_back_one_cycle_at_most(self):
+        self.claim(1000)
+        self.assertEqual(self.claim(1100), [1, 2])
+        self.assertEqual(self.scheduler.redis_client.get(self.scheduler.last_tick_key), b"1092")
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """`ORJSONRenderer` output compared with DRF's `JSONRenderer`."""
+
+    def test_output_matches_json_renderer(self):
+        data = {
+            "posted_at": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=UTC),
+            "created_at": datetime(2024, 5, 1, 12, 30, 15, tzinfo=UTC),
+            "naive": datetime(2024, 5, 1, 12, 30),
+            "day": date(2024, 5, 1),
+            "time": time(12, 30, 15, 500),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "score": Decimal("1.50"),
+            "label": gettext_lazy("Tracks"),
+            "title": "Sigur R\u00f3s \u2028 \u2029",
+            "posts": [{"id": 1, "count": 2.5, "tags": ("a", None)}, {"id": 2, "flag": True}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_finite_floats_follow_strict_json(self):
+        for value in (float("nan"), float("inf")):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({"score": value})
+                with self.assertRaises(ValueError):
+                    ORJSONRenderer().render({"score": value})
+
+
+def make_credential(user: User, expires_in: timedelta) -> SocialCredential:
+    credential = SocialCredential(user=user, platform="spotify", expires_at=timezone.now() + expires_in)
+    credential.access_token_value = f"access-{user.username}"
+    credential.refresh_token_value = f"refresh-{user.username}"
+    credential.save()
+    return credential
+
+
+def make_token_info(refresh_token: str) -> TokenInfo:
+    return TokenInfo(access_token=f"new-{refresh_token}", refresh_token=f"rotated-{refresh_token}",
+                     scope="user-library-read", token_type="Bearer")
+
+
+class SpotifyAccessTokenSingleFlightTests(TransactionTestCase):
+    """Refresh-on-read of an expired token by concurrent `SpotifyAuthService.get_access_token` callers."""
+
+    def setUp(self):
+        try:
+            get_redis_client().ping()
+        except RedisError:
+            self.skipTest("Redis is not available.")
+        self.user = User.objects.create(username="listener")
+        make_credential(self.user, timedelta(minutes=-1))
+        get_access_token_cache().invalidate(self.user.pk)
+        self.addCleanup(get_access_token_cache().invalidate, self.user.pk)
+        self.addCleanup(get_redis_client().delete, f"spotify:token_refresh_lock:{self.user.pk}")
+
+    def test_concurrent_callers_refresh_once(self):
+        refresh_service = mock.Mock()
+        refresh_service.refresh_access_token.side_effect = make_token_info
+        barrier = threading.Barrier(4)
+        tokens = []
+
+        def get_access_token():
+            try:
+                barrier.wait()
+                tokens.append(SpotifyAuthService.get_access_token(User.objects.get(pk=self.user.pk)))
+            finally:
+                connections.close_all()
+
+        with mock.patch("spotify_integration.services.spotify_auth_service.get_token_refresh_service",
+                        return_value=refresh_service):
+            threads = [threading.Thread(target=get_access_token) for _ in range(barrier.parties)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        refresh_service.refresh_access_token.assert_called_once_with("refresh-listener")
+        self.assertEqual(tokens, ["new-refresh-listener"] * barrier.parties)
+
+
+class SpotifyTokenRefreshServiceLockTests(TestCase):
+    """`SpotifyTokenRefreshService.refresh_expiring_tokens` under the per-user token refresh lock."""
+
+    def setUp(self):
+        try:
+            get_redis_client().ping()
+        except RedisError:
+            self.skipTest("Redis is not available.")
+        self.users = [User.objects.create(username=f"listener{index}") for index in range(3)]
+        for user in self.users:
+            make_credential(user, timedelta(minutes=1))
+            self.addCleanup(get_redis_client().delete, f"spotify:token_refresh_lock:{user.pk}")
+        self.refresh_service = SpotifyTokenRefreshService(concurrency=2)
+        self.addCleanup(self.refresh_service.close)
+
+    def test_user_with_held_lock_is_skipped(self):
+        lock = get_token_refresh_lock(self.users[0].pk)
+        self.assertTrue(lock.acquire(blocking=False))
+        self.addCleanup(lock.release)
+
+        with mock.patch.object(self.refresh_service, "refresh_access_token", side_effect=make_token_info) as refresh:
+            self.assertEqual(self.refresh_service.refresh_expiring_tokens(window=600), (2, 0))
+
+        self.assertCountEqual([call.args[0] for call in refresh.call_args_list],
+                              ["refresh-listener1", "refresh-listener2"])
+        refresh_tokens = {
+            credential.user.username: credential.refresh_token_value for credential in SocialCredential.objects.all()
+        }
+        self.assertEqual(refresh_tokens, {
+            "listener0": "refresh-listener0",
+            "listener1": "rotated-refresh-listener1",
+            "listener2": "rotated-refresh-listener2",
+        })
+        self.assertFalse(get_token_refresh_lock(self.users[1].pk).locked())
+
+
+class SyncLeaseServiceTests(SimpleTestCase):
+    """Deduplication of concurrent syncs of a collection by `SyncLeaseService`."""
+
+    def setUp(self):
+        try:
+            get_redis_client().ping()
+        except RedisError:
+            self.skipTest("Redis is not available.")
+        self.prefix = f"test:sync_lease:{uuid.uuid4().hex}"
+        self.addCleanup(self.delete_keys)
+
+    def delete_keys(self):
+        if keys := get_redis_client().keys(f"{self.prefix}:*"):
+            get_redis_client().delete(*keys)
+
+    def make_lease_service(self, mode: str) -> SyncLeaseService:
+        lease_service = SyncLeaseService(mode=mode)
+        lease_service.prefix = self.prefix
+        lease_service.stats_key = f"{self.prefix}:stats"
+        return lease_service
+
+    def test_duplicate_is_coalesced(self):
+        lease_service = self.make_lease_service("coalesce")
+        token = lease_service.acquire(1, "tracks")
+        self.assertIsNotNone(token)
+
+        self.assertIsNone(lease_service.acquire(1, "tracks"))
+        self.assertIsNotNone(lease_service.acquire(1, "playlists"))
+        self.assertIsNotNone(lease_service.acquire(2, "tracks"))
+        self.assertEqual(lease_service.get_stats(), {"suppressed": 1, "coalesced": 0})
+
+        self.assertTrue(lease_service.release(1, "tracks", token))
+        token = lease_service.acquire(1, "tracks")
+        self.assertIsNotNone(token)
+        self.assertFalse(lease_service.release(1, "tracks", token))
+
+    def test_duplicate_is_dropped(self):
+        lease_service = self.make_lease_service("drop")
+        token = lease_service.acquire(1, "tracks")
+
+        self.assertIsNone(lease_service.acquire(1, "tracks"))
+        self.assertFalse(lease_service.release(1, "tracks", token))
+        self.assertEqual(lease_service.get_stats(), {"suppressed": 1, "coalesced": 0})
+
+    def test_release_keeps_lease_of_another_holder(self):
+        lease_service = self.make_lease_service("coalesce")
+        token = lease_service.acquire(1, "tracks")
+
+        lease_service.release(1, "tracks", "stale-token")
+        self.assertIsNone(lease_service.acquire(1, "tracks"))
+        self.assertTrue(lease_service.release(1, "tracks", token))
+
+    def test_record_coalesced(self):
+        lease_service = self.make_lease_service("coalesce")
+        lease_service.record_coalesced(2)
+        lease_service.record_coalesced(1)
+        self.assertEqual(lease_service.get_stats(), {"suppressed": 0, "coalesced": 3})
@@ -13,4 +13,7 @@ urlpatterns = [
     path("sync/tracks/", views.SpotifyTracksSyncView.as_view(), name="spotify_tracks"),
     path("sync/playlists/", views.SpotifyPlaylistsSyncView.as_view(), name="spotify_playlists"),
     path("sync/following/", views.SpotifyFollowingSyncView.as_view(), name="spotify_following_artists"),
+    path("sync/jobs/<str:job_id>/", views.SpotifySyncJobView.as_view(), name="spotify_sync_job"),
+
+    path("feed/", views.SocialFeedView.as_view(), name="spotify_feed"),
 ]
@@ -1,21 +1,39 @@
 import logging
+from collections.abc import Iterable, Iterator
+from urllib.parse import urlencode
 
+import orjson
+from django.conf import settings
 from django.contrib.auth import login as django_login
 from django.contrib.auth import logout
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from response_handlers import error_response, success_response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-from spotify_integration.models import SocialCredential
+from spotify_integration.models import SocialCredential, SocialSyncSchedule
 from spotify_integration.schemes import TokenInfo
-from spotify_integration.serializers import SpotifyAuthSerializer, SpotifyCallbackSerializer
-from spotify_integration.services import SpotifyAuthService, SpotifyDataService, SpotifyService, StateStorageService
-from spotify_integration.tasks import (
-    fetch_spotify_following_task,
-    fetch_spotify_playlists_task,
-    fetch_spotify_tracks_task,
+from spotify_integration.serializers import (
+    SocialFeedQuerySerializer,
+    SocialPostSerializer,
+    SpotifyAuthSerializer,
+    SpotifyCallbackSerializer,
 )
+from spotify_integration.services import (
+    SocialFeedCache,
+    SocialFeedService,
+    SpotifyAuthService,
+    SpotifyDataService,
+    SpotifyService,
+    StateStorageService,
+    SyncJobService,
+    SyncLeaseService,
+    get_access_token_cache,
+)
+from spotify_integration.services.social_feed_service import InvalidCursorError
+from spotify_integration.tasks import sync_user_library_task
 
 logger = logging.getLogger("spotify_integration")
 
@@ -68,10 +86,9 @@ class SpotifyCallbackView(APIView):
             self.auth_service.create_or_update_user_credentials(user, token_info)
             django_login(request, user)
 
-            # Trigger background tasks to fetch Spotify data
-            fetch_spotify_tracks_task.delay(request.user.id)
-            fetch_spotify_playlists_task.delay(request.user.id)
-            fetch_spotify_following_task.delay(request.user.id)
+            # A returning user is likely to change the library soon: sync now and at the shortest interval.
+            SocialSyncSchedule.objects.reset(user, "spotify")
+            sync_user_library_task.delay(request.user.id)
 
         except Exception as e:
             return error_response(
@@ -93,6 +110,7 @@ class SpotifyDisconnectView(APIView):
             credential = request.user.social_credentials.filter(platform="spotify").first()
             if credential:
                 credential.delete()
+                get_access_token_cache().invalidate(request.user.pk)
                 logger.info(f"Spotify disconnected for user: {request.user.username}")
                 logout(request)
                 return success_response(message="Spotify disconnected.")
@@ -132,88 +150,195 @@ class SpotifyRefreshView(APIView):
         return success_response(message="Spotify refresh access token successful.")
 
 
-class SpotifyTracksSyncView(APIView):
-    """Trigger background fetch of Spotify tracks."""
+def stream_json_array(pages: Iterable[list]) -> Iterator[bytes]:
+    """Render pages of items as one JSON array, item by item."""
+    separator = b""
+    yield b"["
+    try:
+        for page in pages:
+            for item in page:
+                yield separator + orjson.dumps(item)
+                separator = b","
+    except Exception as e:
+        # The response has already started: re-raise so the server aborts it and the client sees
+        # an incomplete body, instead of a well-formed but truncated array.
+        logger.error(f"Error streaming Spotify payload: {e}", exc_info=True)
+        raise
+    yield b"]"
+
+
+class SpotifySyncView(APIView):
+    """
+    Base view for syncing one Spotify collection.
+
+    By default the sync is enqueued and the view answers 202 with a job ID that can be polled
+    at the job status endpoint. `?sync=true` runs the sync inside the request and returns a summary
+    of the changes. `?debug=raw` streams the raw Spotify items without syncing, if `SPOTIFY_SYNC_RAW_DEBUG` is on.
+    """
     permission_classes = [IsAuthenticated]
+    collection: str
 
     def post(self, request, *args, **kwargs):
-        """Fetch Spotify tracks."""
+        """Enqueue a sync of the collection, run it now with `?sync=true` or stream it with `?debug=raw`."""
 
-        data_service = SpotifyDataService()
-        auth_service = SpotifyAuthService()
+        if request.query_params.get("debug") == "raw":
+            return self.stream_raw(request)
+
+        if request.query_params.get("sync", "").lower() in ("1", "true"):
+            return self.sync_now(request)
 
         try:
-            access_token = auth_service.get_access_token(request.user)
-            tracks_spotify_data = data_service.fetch_user_tracks(access_token)
-            social_posts = data_service.map_tracks_to_social_posts(request.user, tracks_spotify_data)
-            data_service.bulk_update_social_posts(
-                user=request.user,
-                platform="spotify",
-                post_type="tracks",
-                social_posts=social_posts)
+            job_id = SyncJobService().create(request.user.id, [self.collection])
+            sync_user_library_task.delay(request.user.id, collections=[self.collection], job_id=job_id)
 
         except Exception as e:
             return error_response(
-                message=f"Error fetching Spotify tracks: {e}",
+                message=f"Error enqueueing Spotify {self.collection} sync: {e}",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        return success_response(data=tracks_spotify_data, message="Spotify tracks fetched successfully.")
-
+        return success_response(
+            data={
+                "job_id": job_id,
+                "status_url": reverse("spotify:spotify_sync_job", kwargs={"job_id": job_id}),
+            },
+            message=f"Spotify {self.collection} sync started.",
+            status_code=status.HTTP_202_ACCEPTED,
+        )
 
-class SpotifyPlaylistsSyncView(APIView):
-    """Trigger background fetch of Spotify tracks."""
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request, *args, **kwargs):
-        """Fetch Spotify playlists."""
+    def sync_now(self, request):
+        """Sync the collection and return the numbers of created, updated, unchanged and deleted posts."""
 
         data_service = SpotifyDataService()
         auth_service = SpotifyAuthService()
+        lease_service = SyncLeaseService()
 
+        if not (lease_token := lease_service.acquire(request.user.id, self.collection)):
+            return error_response(message=f"Spotify {self.collection} sync is already running.",
+                                  status_code=status.HTTP_409_CONFLICT)
         try:
             access_token = auth_service.get_access_token(request.user)
-            playlists_spotify_data = data_service.fetch_user_playlists(access_token)
-            social_posts = data_service.map_playlists_to_social_posts(request.user, playlists_spotify_data)
-            data_service.bulk_update_social_posts(
-                user=request.user,
-                platform="spotify",
-                post_type="playlists",
-                social_posts=social_posts)
+            # The streaming sync keeps one page of the library in memory, not the whole collection.
+            result = data_service.sync_user_library(request.user, access_token, [self.collection])[self.collection]
+            if isinstance(result, Exception):
+                raise result
 
         except Exception as e:
             return error_response(
-                message=f"Error fetching Spotify playlists: {e}",
+                message=f"Error fetching Spotify {self.collection}: {e}",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        finally:
+            if lease_service.release(request.user.id, self.collection, lease_token):
+                lease_service.record_coalesced(1)
+                sync_user_library_task.delay(request.user.id, collections=[self.collection])
 
-        return success_response(data=playlists_spotify_data, message="Spotify playlists fetched successfully.")
+        return success_response(
+            data={"collection": self.collection, **result.model_dump()},
+            message=f"Spotify {self.collection} fetched successfully.",
+        )
 
+    def stream_raw(self, request):
+        """Stream the raw Spotify items of the collection as a JSON array, for debugging."""
 
-class SpotifyFollowingSyncView(APIView):
-    """Trigger background fetch of Spotify followings artists."""
-    permission_classes = [IsAuthenticated]
+        if not settings.SPOTIFY_SYNC_RAW_DEBUG:
+            return error_response(message="Raw Spotify payloads are disabled.", status_code=status.HTTP_403_FORBIDDEN)
 
-    def post(self, request, *args, **kwargs):
-        """Fetch Spotify tracks."""
+        try:
+            access_token = SpotifyAuthService().get_access_token(request.user)
+        except Exception as e:
+            return error_response(
+                message=f"Error fetching Spotify {self.collection}: {e}",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
-        data_service = SpotifyDataService()
-        auth_service = SpotifyAuthService()
+        pages = SpotifyDataService().iter_user_collection(access_token, self.collection)
+        return StreamingHttpResponse(stream_json_array(pages), content_type="application/json")
 
-        try:
-            access_token = auth_service.get_access_token(request.user)
-            following_spotify_data = data_service.fetch_user_following(access_token)
-            social_posts = data_service.map_following_artists_to_social_posts(request.user, following_spotify_data)
-            data_service.bulk_update_social_posts(
-                user=request.user,
-                platform="spotify",
-                post_type="artists",
-                social_posts=social_posts)
 
+class SpotifyTracksSyncView(SpotifySyncView):
+    """Trigger fetch of Spotify tracks."""
+    collection = "tracks"
+
+
+class SpotifyPlaylistsSyncView(SpotifySyncView):
+    """Trigger fetch of Spotify playlists."""
+    collection = "playlists"
+
+
+class SpotifyFollowingSyncView(SpotifySyncView):
+    """Trigger fetch of Spotify followings artists."""
+    collection = "following"
+
+
+class SpotifySyncJobView(APIView):
+    """View to poll the status of a Spotify sync job."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        """Get state, pages fetched and rows written of a sync job."""
+
+        try:
+            job = SyncJobService().get(job_id)
         except Exception as e:
             return error_response(
-                message=f"Error fetching Spotify following: {e}",
+                message=f"Error reading Spotify sync job: {e}",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        return success_response(data=following_spotify_data, message="Spotify following fetched successfully.")
+        if job is None or job["user_id"] != request.user.id:
+            return error_response(message=f"Sync job {job_id} not found.", status_code=status.HTTP_404_NOT_FOUND)
+
+        return success_response(data=job)
+
+
+class SocialFeedView(APIView):
+    """
+    View to list the user's social posts of one type, newest first, with cursor pagination.
+    Pages are cached in Redis until a sync changes the posts (see `SocialFeedCache`).
+    """
+    permission_classes = [IsAuthenticated]
+    query_serializer_class = SocialFeedQuerySerializer
+    serializer_class = SocialPostSerializer
+    feed_service = SocialFeedService()
+
+    def get(self, request, *args, **kwargs):
+        """Get a page of the feed; pass `next_cursor` as `cursor` to get the next one."""
+
+        query = self.query_serializer_class(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        post_type = query.validated_data["post_type"]
+        page_size = query.validated_data["page_size"]
+        cursor = query.validated_data.get("cursor")
+
+        feed_cache = SocialFeedCache() if settings.SOCIAL_FEED_CACHE else None
+        version = feed_cache.get_version(request.user.id, "spotify", post_type) if feed_cache else None
+        if version:
+            page = feed_cache.get_page(request.user.id, "spotify", post_type, version, page_size, cursor)
+            if page is not None:
+                return success_response(data=self.with_next_url(request, page))
+
+        try:
+            posts, next_cursor = self.feed_service.get_page(
+                request.user,
+                platform="spotify",
+                post_type=post_type,
+                page_size=page_size,
+                cursor=cursor,
+            )
+        except InvalidCursorError as e:
+            return error_response(message=str(e))
+
+        page = {"results": self.serializer_class(posts, many=True).data, "next_cursor": next_cursor}
+        if version:
+            feed_cache.set_page(request.user.id, "spotify", post_type, version, page_size, cursor, page)
+        return success_response(data=self.with_next_url(request, page))
+
+    @staticmethod
+    def with_next_url(request, page: dict) -> dict:
+        next_url = None
+        if page["next_cursor"]:
+            next_url = request.build_absolute_uri(
+                f"{request.path}?{urlencode({**request.query_params.dict(), 'cursor': page['next_cursor']})}"
+            )
+        return {**page, "next": next_url}